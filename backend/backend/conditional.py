@@ -0,0 +1,156 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+VIEWER_VERSION_CACHE_KEY = 'viewer_version:{}'
+# Бэкенды, у которых данные свои в каждом процессе
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def versions_are_shared():
+    """Видят ли смену версий все воркеры и management-команды.
+
+    В LocMemCache у каждого процесса свои метки, сброс в одном
+    воркере до остальных не доходит.
+    """
+    return (settings.CACHES['default']['BACKEND']
+            not in PROCESS_LOCAL_CACHE_BACKENDS)
+
+
+def get_versions(keys):
+    """Версии — метки времени последнего изменения в наносекундах.
+
+    Отсутствующая в кеше версия заводится заново текущим временем,
+    поэтому после вытеснения ключа старые ответы не используются.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*keys):
+    def bump():
+        now = time.time_ns()
+        cache.set_many({key: now for key in keys}, timeout=None)
+    # Сброс после коммита, иначе параллельный запрос может закешировать
+    # ещё не зафиксированное состояние под новой версией
+    transaction.on_commit(bump)
+
+
+def invalidate_viewer(sender, instance, **kwargs):
+    """Обработчик для Favorite, ShoppingCart и Subscription.
+
+    Меняет версию персональных флагов пользователя, который добавил
+    рецепт в избранное или корзину либо подписался на автора.
+    """
+    if sender._meta.model_name == 'subscription':
+        user_id = instance.user_id
+    else:
+        user_id = instance.author_id
+    bump_versions(VIEWER_VERSION_CACHE_KEY.format(user_id))
+
+
+def get_signature(request, *parts):
+    """Хеш адреса, отсортированных параметров запроса и parts."""
+    query = '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(request.query_params.lists())
+        for value in values
+    )
+    return hashlib.md5(
+        f'{request.build_absolute_uri(request.path)}?{query}:{parts}'.encode()
+    ).hexdigest()
+
+
+def get_validators(request, versions, personalized=True):
+    """ETag и Last-Modified по адресу, пользователю и версиям выдачи.
+
+    Без общего кеша валидаторов нет: версия из кеша процесса не знает
+    об изменениях в других воркерах, и 304 отдавался бы на устаревшую
+    выдачу.
+    """
+    if not versions_are_shared():
+        return None, None
+    user_id = None
+    if personalized and request.user.is_authenticated:
+        user_id = request.user.pk
+    etag = f'"{get_signature(request, user_id, versions)}"'
+    return etag, max(versions) // 10 ** 9
+
+
+def is_not_modified(request, etag, last_modified):
+    if etag is None:
+        return False
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')]
+    if_modified_since = parse_http_date_safe(
+        request.headers.get('If-Modified-Since', '')
+    )
+    return (if_modified_since is not None
+            and last_modified <= if_modified_since)
+
+
+def with_validators(response, etag, last_modified):
+    if etag is None:
+        return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    return with_validators(
+        Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified
+    )
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы для APIView.
+
+    Валидаторы строятся только по версиям из кеша, без обращения к БД:
+    представление перечисляет ключи версий, от которых зависит выдача,
+    а для авторизованного пользователя к ним добавляется версия его
+    подписок, избранного и корзины. Для выдачи, одинаковой для всех
+    пользователей, задаётся personalized = False. При совпадении
+    валидаторов 304 отдаётся до выборки объектов и сериализации.
+    С кешем процесса (LocMemCache) валидаторы не выдаются.
+    """
+
+    version_keys = ()
+    personalized = True
+
+    def get_version_keys(self):
+        keys = list(self.version_keys)
+        user = self.request.user
+        if self.personalized and user.is_authenticated:
+            keys.append(VIEWER_VERSION_CACHE_KEY.format(user.pk))
+        return keys
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = get_validators(
+            request, get_versions(self.get_version_keys()),
+            self.personalized
+        )
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            with_validators(response, etag, last_modified)
+        return response
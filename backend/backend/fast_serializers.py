@@ -0,0 +1,98 @@
+"""Быстрые сериализаторы только для чтения.
+
+Выдача строится из словарей .values() по плану полей — кортежу пар
+(ключ, функция от строки) в порядке полей соответствующего
+ModelSerializer, — без объектов моделей и полей DRF. План собирается
+один раз на страницу, связанные данные загружаются в нём одним
+запросом на страницу. Вывод совпадает с обычными сериализаторами
+байт в байт, см. команду benchmark_serializers.
+"""
+from contextlib import nullcontext
+
+from django.conf import settings
+
+from .images import format_srcset
+from .instrumentation import current_metrics
+
+
+class UrlBuilder:
+    """Абсолютные адреса файлов одного хранилища для запроса."""
+
+    def __init__(self, request, storage):
+        self.request = request
+        self.storage = storage
+        self.prefix = request.build_absolute_uri('/')[:-1]
+
+    def absolute(self, url):
+        # Для путей от корня request.build_absolute_uri() только
+        # дописывает схему и хост: адреса FileSystemStorage уже
+        # экранированы, и iri_to_uri их не меняет
+        if (url.startswith('/') and not url.startswith('//')
+                and '/./' not in url and '/../' not in url):
+            return self.prefix + url
+        return self.request.build_absolute_uri(url)
+
+    def file_url(self, name):
+        if not name:
+            return None
+        return self.absolute(self.storage.url(name))
+
+    def srcset(self, name, thumbnails):
+        return format_srcset(self.absolute, self.storage, name, thumbnails)
+
+
+class FastSerializer:
+    """Основа быстрого сериализатора с интерфейсом сериализатора DRF.
+
+    columns — колонки для .values(), select() применяет их к queryset
+    представления. get_plan() получает все строки страницы
+    и возвращает план полей.
+    """
+
+    columns = ()
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def select(cls, queryset):
+        return queryset.values(*cls.columns)
+
+    def get_plan(self, rows):
+        raise NotImplementedError
+
+    def to_representation(self, rows):
+        plan = self.get_plan(rows)
+        return [{key: get(row) for key, get in plan} for row in rows]
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        metrics = current_metrics()
+        with metrics.measure('serializer') if metrics else nullcontext():
+            items = self.to_representation(rows)
+        return items if self.many else items[0]
+
+
+class FastReadMixin:
+    """GET-запросы представления через fast_serializer_class.
+
+    get_queryset представления при self.fast_read выбирает строки
+    через self.fast_serializer_class.select(). Режим выключается
+    настройкой FAST_READ_SERIALIZERS.
+    """
+
+    fast_serializer_class = None
+
+    @property
+    def fast_read(self):
+        return (settings.FAST_READ_SERIALIZERS
+                and self.request.method in ('GET', 'HEAD'))
+
+    def get_serializer(self, *args, **kwargs):
+        if not self.fast_read:
+            return super().get_serializer(*args, **kwargs)
+        kwargs.setdefault('context', self.get_serializer_context())
+        return self.fast_serializer_class(*args, **kwargs)
@@ -0,0 +1,167 @@
+import io
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+
+logger = logging.getLogger(__name__)
+
+ThumbnailSpec = namedtuple(
+    'ThumbnailSpec', ('field', 'thumbnails_field', 'widths_setting', 'square')
+)
+
+# Для каждой модели: поле с оригиналом, JSON-поле с описанием миниатюр,
+# настройка с шириной миниатюр и нужна ли квадратная обрезка
+THUMBNAIL_SPECS = {
+    'recipes_models.recipe': ThumbnailSpec(
+        'image', 'image_thumbnails', 'RECIPE_IMAGE_WIDTHS', False
+    ),
+    'users_models.customuser': ThumbnailSpec(
+        'avatar', 'avatar_thumbnails', 'AVATAR_IMAGE_WIDTHS', True
+    ),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                    thread_name_prefix='thumbnails'
+                )
+    return _executor
+
+
+def get_thumbnail_format():
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def render_thumbnails(storage, name, widths, square):
+    """Сохраняет уменьшенные копии оригинала и возвращает их описание.
+
+    Копии шире оригинала не создаются, сам оригинал входит в srcset
+    со своей шириной.
+    """
+    image_format, extension = get_thumbnail_format()
+    with storage.open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if image_format == 'WEBP' and image.has_transparency_data
+            else 'RGB'
+        )
+
+    root = os.path.splitext(name)[0]
+    original_width = min(image.size) if square else image.width
+    variants = []
+    for width in sorted(widths):
+        if width >= original_width:
+            break
+        if square:
+            thumbnail = ImageOps.fit(image, (width, width), Image.LANCZOS)
+        else:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, image.height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, image_format, quality=80)
+        variant_name = storage.save(
+            f'{root}_{width}.{extension}', ContentFile(buffer.getvalue())
+        )
+        variants.append([variant_name, width])
+
+    return {'source': name, 'width': original_width, 'variants': variants}
+
+
+def generate_thumbnails(label, pk, name):
+    """Задача пайплайна: миниатюры для одного загруженного изображения.
+
+    Результат записывается, только если оригинал не сменился, пока
+    задача ждала в очереди. Сохранение через save() вызывает обычные
+    сигналы, и закешированные выдачи с этим объектом сбрасываются.
+    """
+    model = apps.get_model(label)
+    spec = THUMBNAIL_SPECS[label]
+    storage = model._meta.get_field(spec.field).storage
+    try:
+        thumbnails = render_thumbnails(
+            storage, name, getattr(settings, spec.widths_setting), spec.square
+        )
+        with transaction.atomic():
+            instance = model.objects.select_for_update().filter(
+                pk=pk
+            ).first()
+            if instance is None or getattr(instance, spec.field).name != name:
+                return
+            setattr(instance, spec.thumbnails_field, thumbnails)
+            instance.save(update_fields=[spec.thumbnails_field])
+    except Exception:
+        logger.exception('thumbnails failed for %s %s (%s)', label, pk, name)
+
+
+def _run(label, pk, name):
+    try:
+        generate_thumbnails(label, pk, name)
+    finally:
+        # Соединения рабочего потока не должны оставаться открытыми
+        connections.close_all()
+
+
+def schedule_thumbnails(sender, instance, **kwargs):
+    """Обработчик post_save для моделей из THUMBNAIL_SPECS.
+
+    Ставит в очередь генерацию миниатюр после коммита, если оригинал
+    изменился. IMAGE_PIPELINE_BACKEND: thread — пул потоков процесса,
+    sync — сразу в текущем потоке.
+    """
+    label = sender._meta.label_lower
+    spec = THUMBNAIL_SPECS[label]
+    field_file = getattr(instance, spec.field)
+    thumbnails = getattr(instance, spec.thumbnails_field) or {}
+    if not field_file or thumbnails.get('source') == field_file.name:
+        return
+
+    pk, name = instance.pk, field_file.name
+    if settings.IMAGE_PIPELINE_BACKEND == 'sync':
+        transaction.on_commit(lambda: generate_thumbnails(label, pk, name))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(_run, label, pk, name)
+        )
+
+
+def build_srcset(request, field_file, thumbnails):
+    """srcset из миниатюр и оригинала или None, пока их нет."""
+    if not field_file:
+        return None
+    return format_srcset(request.build_absolute_uri, field_file.storage,
+                         field_file.name, thumbnails)
+
+
+def format_srcset(build_url, storage, name, thumbnails):
+    """srcset по имени файла, build_url делает адреса абсолютными."""
+    if not name or not thumbnails or thumbnails.get('source') != name:
+        return None
+    entries = [
+        f'{build_url(storage.url(variant))} {width}w'
+        for variant, width in thumbnails['variants']
+    ]
+    entries.append(f'{build_url(storage.url(name))} {thumbnails["width"]}w')
+    return ', '.join(entries)
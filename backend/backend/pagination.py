@@ -0,0 +1,219 @@
+import base64
+import binascii
+import hashlib
+import json
+import time
+from functools import partial, reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+COUNT_VERSION_CACHE_KEY = 'pagination_count_version:{}'
+COUNT_CACHE_KEY = 'pagination_count:{}:{}'
+
+
+def get_count_versions(labels):
+    keys = [COUNT_VERSION_CACHE_KEY.format(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_counts(sender, **kwargs):
+    """Обработчик post_save/post_delete для моделей в выдачах.
+
+    Меняет версию модели, и закешированные количества объектов во всех
+    выдачах, которые от неё зависят, перестают использоваться.
+    """
+    if not kwargs.get('created', True):
+        return
+    key = COUNT_VERSION_CACHE_KEY.format(sender._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def estimate_count(queryset):
+    """Оценка планировщика PostgreSQL для таблицы без фильтров."""
+    query = queryset.query
+    connection = connections[queryset.db]
+    if (connection.vendor != 'postgresql' or query.where
+            or query.distinct or query.low_mark or query.high_mark):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < settings.PAGINATION_ESTIMATE_THRESHOLD:
+        return None
+    return row[0]
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который кеширует COUNT(*) по сигнатуре запроса.
+
+    Режим задаётся настройкой PAGINATION_COUNT_MODE: exact — всегда
+    точный подсчёт, cached — кеш на PAGINATION_COUNT_CACHE_TIMEOUT
+    секунд со сбросом при создании и удалении объектов моделей
+    из count_dependencies, estimated — то же, но для выдачи без
+    фильтров на PostgreSQL используется оценка reltuples.
+    """
+
+    def __init__(self, object_list, per_page, count_dependencies=(),
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_dependencies = count_dependencies
+
+    @cached_property
+    def count(self):
+        mode = settings.PAGINATION_COUNT_MODE
+        if mode == 'exact' or not hasattr(self.object_list, 'query'):
+            return super().count
+        try:
+            signature = hashlib.md5(
+                str(self.object_list.query).encode()
+            ).hexdigest()
+        except EmptyResultSet:
+            return super().count
+
+        labels = sorted(
+            {self.object_list.model._meta.label_lower}
+            | {model._meta.label_lower for model in self.count_dependencies}
+        )
+        key = COUNT_CACHE_KEY.format(
+            '.'.join(str(version) for version in get_count_versions(labels)),
+            signature
+        )
+        count = cache.get(key)
+        if count is None:
+            if mode == 'estimated':
+                count = estimate_count(self.object_list)
+            if count is None:
+                count = super().count
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class StandardPagination(PageNumberPagination):
+    """Постраничная пагинация с необязательным keyset-режимом.
+
+    Если у представления задан keyset_ordering и в запросе есть параметр
+    cursor (в том числе пустой, для первой страницы), выдача идёт по
+    ключу сортировки без COUNT(*) и OFFSET, а ссылка next содержит
+    курсор с ключом последнего объекта страницы.
+    """
+
+    page_size = 10
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_ordering = getattr(view, 'keyset_ordering', None)
+        if (self.keyset_ordering is None
+                or self.cursor_query_param not in request.query_params):
+            self.keyset_ordering = None
+            self.django_paginator_class = partial(
+                CachedCountPaginator,
+                count_dependencies=getattr(view, 'count_dependencies', ())
+            )
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.keyset_ordering)
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        items = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            self.next_position = self.get_position(items[-1])
+        return items
+
+    def get_paginated_response(self, data):
+        if self.keyset_ordering is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_position(self, item):
+        fields = [field.lstrip('-') for field in self.keyset_ordering]
+        # Быстрые сериализаторы получают строки .values()
+        if isinstance(item, dict):
+            return [item[field] for field in fields]
+        return [getattr(item, field) for field in fields]
+
+    def get_keyset_filter(self, position):
+        # (a, b) < (x, y) раскрывается в a <= x AND (a < x OR a = x AND b < y),
+        # чтобы условие по первому полю попадало в составной индекс
+        fields = [field.lstrip('-') for field in self.keyset_ordering]
+        lookup = 'lt' if self.keyset_ordering[0].startswith('-') else 'gt'
+
+        conditions = []
+        for index, field in enumerate(fields):
+            condition = Q(**{f'{field}__{lookup}': position[index]})
+            for previous, value in zip(fields[:index], position[:index]):
+                condition &= Q(**{previous: value})
+            conditions.append(condition)
+
+        return (
+            Q(**{f'{fields[0]}__{lookup}e': position[0]})
+            & reduce(or_, conditions)
+        )
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(self.keyset_ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.keyset_ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in position
+        ]
+        return base64.urlsafe_b64encode(
+            json.dumps(values).encode()
+        ).decode()
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
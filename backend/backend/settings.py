@@ -19,7 +19,9 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
+    'django_filters',
     'djoser',
     'rest_framework.authtoken',
     'users',
@@ -29,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -105,10 +108,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users_models.CustomUser'
 
+# Версии выдачи и каталога должны быть общими для воркеров, в
+# infra/docker-compose.yml это Redis. LocMemCache — для разработки
+# и тестов: каталог тогда сверяется с таблицей, ETag не выдаются
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_RESPONSE_CACHE_TIMEOUT', 300)
+)
+
+# exact, cached или estimated, см. backend.pagination.CachedCountPaginator
+PAGINATION_COUNT_MODE = os.getenv('PAGINATION_COUNT_MODE', 'cached')
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 30)
+)
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+
+# Предел для изображений в base64 и multipart, тело запроса
+# ограничено в nginx client_max_body_size 10M
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+)
+
+# thread или sync, см. backend.images.schedule_thumbnails
+IMAGE_PIPELINE_BACKEND = os.getenv('IMAGE_PIPELINE_BACKEND', 'thread')
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+# Ширина миниатюр: карточка в ленте и страница рецепта; аватар 1x и 2x
+RECIPE_IMAGE_WIDTHS = (480, 1200)
+AVATAR_IMAGE_WIDTHS = (96, 192)
+
+# Метрики запросов: Server-Timing, лог и /api/metrics/ для Prometheus
+REQUEST_METRICS_ENABLED = os.getenv(
+    'REQUEST_METRICS_ENABLED', 'false'
+).lower() in ('1', 'true', 'yes')
+REQUEST_METRICS_TOKEN = os.getenv('REQUEST_METRICS_TOKEN', '')
+REQUEST_METRICS_REPEATED_QUERY_THRESHOLD = int(
+    os.getenv('REQUEST_METRICS_REPEATED_QUERY_THRESHOLD', 5)
+)
+
+# GET list/retrieve рецептов, пользователей и подписок через
+# сериализаторы по строкам .values(), см. backend.fast_serializers
+FAST_READ_SERIALIZERS = os.getenv(
+    'FAST_READ_SERIALIZERS', 'true'
+).lower() in ('1', 'true', 'yes')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 
@@ -124,3 +187,12 @@ DJOSER = {
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'backend.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
@@ -0,0 +1,68 @@
+import hashlib
+import os
+from collections import Counter
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from .images import THUMBNAIL_SPECS
+
+
+BLOB_DIRECTORY = 'blobs'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — SHA-256 его содержимого.
+
+    Одинаковые изображения, загруженные повторно или разными
+    пользователями, хранятся одним файлом, и повторная запись
+    не выполняется. Файлы не удаляются при смене изображения: на один
+    файл могут ссылаться несколько рецептов и аватаров, поэтому файлы
+    без ссылок удаляет команда gc_media.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            # Свежее время изменения защищает файл от gc_media,
+            # пока новая ссылка на него не сохранена в БД
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    @staticmethod
+    def get_content_name(name, content):
+        # File.chunks() читает содержимое с начала при каждом вызове
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return f'{BLOB_DIRECTORY}/{digest[:2]}/{digest}{extension}'
+
+
+def get_reference_counts():
+    """Число ссылок из БД на каждый файл: оригиналы и их миниатюры.
+
+    Ссылки собираются по всем полям из THUMBNAIL_SPECS, поэтому общий
+    для рецепта и аватара файл считается дважды.
+    """
+    counts = Counter()
+    for label, spec in THUMBNAIL_SPECS.items():
+        rows = apps.get_model(label).objects.exclude(
+            **{f'{spec.field}__isnull': True}
+        ).exclude(
+            **{spec.field: ''}
+        ).values_list(spec.field, spec.thumbnails_field)
+        for name, thumbnails in rows.iterator():
+            counts[name] += 1
+            if thumbnails and thumbnails.get('source') == name:
+                for variant_name, _ in thumbnails['variants']:
+                    counts[variant_name] += 1
+    return counts
@@ -0,0 +1,104 @@
+import uuid
+
+import filetype
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    SkipFile, TemporaryFileUploadHandler
+)
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from rest_framework.exceptions import ValidationError
+
+
+# filetype определяет формат по первым 261 байту файла
+SIGNATURE_SIZE = 261
+IMAGE_TOO_LARGE_MESSAGE = 'Image is too large'
+IMAGE_TYPE_MESSAGE = 'Unsupported image type'
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Приём изображений из multipart/form-data по частям во временный файл.
+
+    Размер проверяется на каждом полученном куске, формат — по сигнатуре
+    в начале файла, поэтому слишком большой файл или не изображение
+    отклоняются, не дочитывая тело запроса. Файлы в остальных полях
+    пропускаются. Сохранённый файл получает имя uuid4 с расширением
+    по сигнатуре, как и изображения из base64.
+    """
+
+    def __init__(self, request=None, field_names=()):
+        super().__init__(request)
+        self.field_names = field_names
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name not in self.field_names:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self.size = 0
+        self.head = b''
+        self.extension = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.reject(IMAGE_TOO_LARGE_MESSAGE)
+        if self.extension is None:
+            self.head += raw_data[:SIGNATURE_SIZE - len(self.head)]
+            if len(self.head) >= SIGNATURE_SIZE:
+                self.check_signature()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.extension is None:
+            self.check_signature()
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.name = f'{uuid.uuid4()}.{self.extension}'
+        return uploaded_file
+
+    def check_signature(self):
+        extension = filetype.guess_extension(self.head)
+        if extension not in Base64ImageField.ALLOWED_TYPES:
+            self.reject(IMAGE_TYPE_MESSAGE)
+        self.extension = extension
+
+    def reject(self, message):
+        # Временный файл ещё не передан парсеру, закрываем его сами
+        self.file.close()
+        raise ValidationError({self.field_name: [message]})
+
+
+class ImageUploadMixin:
+    """Подключает ImageUploadHandler к представлению.
+
+    Поля с файлами перечисляются в image_upload_fields.
+    """
+
+    image_upload_fields = ()
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [
+            ImageUploadHandler(request, self.image_upload_fields)
+        ]
+        return super().initialize_request(request, *args, **kwargs)
+
+
+class ImageUploadField(Base64ImageField):
+    """Изображение строкой base64 в JSON или файлом из multipart.
+
+    Ошибки drf-extra-fields и Pillow приходят как ValidationError
+    Django и переводятся в ValidationError DRF, чтобы поле можно было
+    вызывать и вне сериализатора.
+    """
+
+    def to_internal_value(self, data):
+        try:
+            if isinstance(data, UploadedFile):
+                # Проверка Pillow без декодирования base64
+                return super(Base64FieldMixin, self).to_internal_value(data)
+            if (isinstance(data, str) and len(data) * 3 // 4
+                    > settings.IMAGE_UPLOAD_MAX_SIZE):
+                raise ValidationError(IMAGE_TOO_LARGE_MESSAGE)
+            return super().to_internal_value(data)
+        except DjangoValidationError as error:
+            raise ValidationError(error.messages)
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
+from backend.instrumentation import RequestMetricsView
 from recipes.views import RecipeShortLinkRedirectView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/metrics/', RequestMetricsView.as_view(),
+         name=RequestMetricsView.url_name),
 
     path('api/users/', include('users.urls')),
     path('api/', include('recipes.urls')),
@@ -4,3 +4,57 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from django.db.models.signals import (
+            post_delete, post_save, pre_delete, pre_save
+        )
+        from backend.conditional import invalidate_viewer
+        from backend.images import schedule_thumbnails
+        from backend.pagination import invalidate_counts
+        from recipes_models.models import (
+            Ingredient, Recipe, RecipeIngredient, Favorite, ShoppingCart
+        )
+        from users_models.models import CustomUser
+        from .cache import (
+            invalidate_recipe, invalidate_recipe_ingredient, invalidate_shared
+        )
+        from .catalog import invalidate_catalog
+        from .shopping_list import (
+            remember_previous, subtract_deleted_cart,
+            subtract_deleted_ingredient, subtract_deleted_recipe,
+            update_cart_shopping_list, update_ingredient_shopping_lists
+        )
+        post_save.connect(invalidate_catalog, sender=Ingredient)
+        post_delete.connect(invalidate_catalog, sender=Ingredient)
+        post_save.connect(invalidate_recipe, sender=Recipe)
+        post_save.connect(schedule_thumbnails, sender=Recipe)
+        post_delete.connect(invalidate_recipe, sender=Recipe)
+        post_save.connect(
+            invalidate_recipe_ingredient, sender=RecipeIngredient
+        )
+        post_delete.connect(
+            invalidate_recipe_ingredient, sender=RecipeIngredient
+        )
+        for model in (Ingredient, CustomUser):
+            post_save.connect(invalidate_shared, sender=model)
+            post_delete.connect(invalidate_shared, sender=model)
+        for model in (Recipe, Favorite, ShoppingCart):
+            post_save.connect(invalidate_counts, sender=model)
+            post_delete.connect(invalidate_counts, sender=model)
+        for model in (Favorite, ShoppingCart):
+            post_save.connect(invalidate_viewer, sender=model)
+            post_delete.connect(invalidate_viewer, sender=model)
+        # Списки покупок следуют за корзинами и ингредиентами рецептов
+        # при любых изменениях через ORM, в том числе из админки
+        for model in (ShoppingCart, RecipeIngredient):
+            pre_save.connect(remember_previous, sender=model)
+        post_save.connect(update_cart_shopping_list, sender=ShoppingCart)
+        post_delete.connect(subtract_deleted_cart, sender=ShoppingCart)
+        post_save.connect(
+            update_ingredient_shopping_lists, sender=RecipeIngredient
+        )
+        post_delete.connect(
+            subtract_deleted_ingredient, sender=RecipeIngredient
+        )
+        pre_delete.connect(subtract_deleted_recipe, sender=Recipe)
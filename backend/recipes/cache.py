@@ -0,0 +1,200 @@
+import copy
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Value
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.conditional import (
+    VIEWER_VERSION_CACHE_KEY, get_versions, bump_versions, get_signature,
+    get_validators, is_not_modified, with_validators, not_modified_response
+)
+from recipes_models.models import Favorite, ShoppingCart
+from users_models.models import Subscription
+from .filters import has_user_filters
+
+
+logger = logging.getLogger(__name__)
+
+FEED_VERSION_CACHE_KEY = 'recipe_response_version:feed'
+SHARED_VERSION_CACHE_KEY = 'recipe_response_version:shared'
+RECIPE_VERSION_CACHE_KEY = 'recipe_response_version:recipe:{}'
+RESPONSE_CACHE_KEY = 'recipe_response:{}'
+STATS_CACHE_KEY = 'recipe_response_stats:{}'
+
+FAVORITE = 1
+CART = 2
+SUBSCRIPTION = 3
+
+
+def invalidate_recipe(sender, instance, **kwargs):
+    """Обработчик post_save/post_delete для Recipe."""
+    bump_versions(
+        FEED_VERSION_CACHE_KEY, RECIPE_VERSION_CACHE_KEY.format(instance.pk)
+    )
+
+
+def invalidate_recipe_ingredient(sender, instance, **kwargs):
+    """Обработчик для RecipeIngredient, изменённых в обход рецепта."""
+    bump_versions(
+        FEED_VERSION_CACHE_KEY,
+        RECIPE_VERSION_CACHE_KEY.format(instance.recipe_id)
+    )
+
+
+def invalidate_shared(sender, **kwargs):
+    """Обработчик для Ingredient и CustomUser, которые входят в рецепты."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_versions(SHARED_VERSION_CACHE_KEY)
+
+
+def record(event):
+    key = STATS_CACHE_KEY.format(event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_stats():
+    stats = cache.get_many(
+        [STATS_CACHE_KEY.format('hit'), STATS_CACHE_KEY.format('miss')]
+    )
+    return {
+        'hit': stats.get(STATS_CACHE_KEY.format('hit'), 0),
+        'miss': stats.get(STATS_CACHE_KEY.format('miss'), 0),
+    }
+
+
+def iter_recipes(data):
+    if 'results' in data:
+        return data['results']
+    return [data]
+
+
+def strip_personal_flags(data):
+    """Делает выдачу RecipeListSerializer общей для всех пользователей."""
+    for recipe in iter_recipes(data):
+        recipe['is_favorited'] = False
+        recipe['is_in_shopping_cart'] = False
+        recipe['author']['is_subscribed'] = False
+    return data
+
+
+def apply_personal_flags(data, request):
+    """Проставляет флаги текущего пользователя в копию общей выдачи.
+
+    Избранное, корзина и подписки по рецептам и авторам выдачи
+    загружаются одним запросом UNION ALL.
+    """
+    data = copy.deepcopy(data)
+    recipes = iter_recipes(data)
+    if not recipes:
+        return data
+
+    user = request.user
+    recipe_ids = [recipe['id'] for recipe in recipes]
+    author_ids = {recipe['author']['id'] for recipe in recipes}
+    rows = Favorite.objects.filter(
+        author=user, recipe_id__in=recipe_ids
+    ).annotate(kind=Value(FAVORITE)).values_list('kind', 'recipe_id').union(
+        ShoppingCart.objects.filter(
+            author=user, recipe_id__in=recipe_ids
+        ).annotate(kind=Value(CART)).values_list('kind', 'recipe_id'),
+        Subscription.objects.filter(
+            user=user, author_id__in=author_ids
+        ).annotate(kind=Value(SUBSCRIPTION)).values_list('kind', 'author_id'),
+        all=True
+    )
+    flags = {FAVORITE: set(), CART: set(), SUBSCRIPTION: set()}
+    for kind, pk in rows:
+        flags[kind].add(pk)
+
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in flags[FAVORITE]
+        recipe['is_in_shopping_cart'] = recipe['id'] in flags[CART]
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in flags[SUBSCRIPTION]
+        )
+    return data
+
+
+class RecipeResponseCacheMixin:
+    """Кеш ответов list/retrieve RecipeViewSet.
+
+    В кеше хранится общая для всех выдача без персональных флагов. Ключ
+    строится из пути, параметров запроса и версий: список зависит от
+    версии ленты, рецепт — от своей версии, оба — от общей версии
+    ингредиентов и пользователей. Авторизованный пользователь получает
+    копию общей выдачи с наложенными флагами is_favorited,
+    is_in_shopping_cart и author.is_subscribed. Выдачи, отфильтрованные
+    по избранному или корзине пользователя, не кешируются.
+
+    Ответы получают ETag и Last-Modified; для авторизованного
+    пользователя в них входит ещё версия его избранного, корзины
+    и подписок. Условный запрос с совпадающими валидаторами получает
+    304 до обращения к кешу выдачи и к БД. Валидаторы выдаются только
+    с общим для воркеров кешем, см. versions_are_shared.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, [FEED_VERSION_CACHE_KEY],
+            lambda: super(RecipeResponseCacheMixin, self).list(
+                request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, [RECIPE_VERSION_CACHE_KEY.format(kwargs['pk'])],
+            lambda: super(RecipeResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs)
+        )
+
+    def cached_response(self, request, version_keys, build):
+        anonymous = request.user.is_anonymous
+        version_keys = version_keys + [SHARED_VERSION_CACHE_KEY]
+        if not anonymous:
+            version_keys.append(
+                VIEWER_VERSION_CACHE_KEY.format(request.user.pk)
+            )
+        versions = get_versions(version_keys)
+        etag, last_modified = get_validators(request, versions)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        if not anonymous and has_user_filters(request):
+            response = build()
+            if response.status_code == status.HTTP_200_OK:
+                with_validators(response, etag, last_modified)
+            return response
+
+        # Общая выдача не зависит от версии флагов пользователя
+        shared_versions = versions if anonymous else versions[:-1]
+        key = RESPONSE_CACHE_KEY.format(
+            get_signature(request, shared_versions)
+        )
+        data = cache.get(key)
+        if data is not None:
+            record('hit')
+            cache_status = 'HIT'
+        else:
+            record('miss')
+            cache_status = 'MISS'
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = strip_personal_flags(response.data)
+            cache.set(key, data, settings.RECIPE_RESPONSE_CACHE_TIMEOUT)
+
+        if not anonymous:
+            data = apply_personal_flags(data, request)
+        response = Response(data)
+        response['X-Cache'] = cache_status
+        logger.debug('recipe response cache %s: %s',
+                     cache_status, request.get_full_path())
+        return with_validators(response, etag, last_modified)
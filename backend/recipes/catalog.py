@@ -0,0 +1,125 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.db.models import Count, Max
+
+from backend.conditional import (
+    bump_versions, get_versions, versions_are_shared
+)
+from recipes_models.models import Ingredient
+
+
+CATALOG_VERSION_CACHE_KEY = 'ingredient_catalog_version'
+
+CatalogIngredient = namedtuple(
+    'CatalogIngredient', ('id', 'name', 'measurement_unit')
+)
+
+
+class IngredientCatalog:
+    """Неизменяемый снимок таблицы ингредиентов в памяти процесса.
+
+    Записи отсортированы по названию без учёта регистра, поэтому поиск
+    по началу названия выполняется бинарным поиском.
+    """
+
+    __slots__ = ('version', '_ids', '_names', '_units',
+                 '_folded_names', '_positions')
+
+    def __init__(self, version, rows):
+        rows = sorted(rows, key=lambda row: (row[1].casefold(), row[0]))
+        self.version = version
+        self._ids = array('q', (row[0] for row in rows))
+        self._names = tuple(row[1] for row in rows)
+        self._units = tuple(row[2] for row in rows)
+        self._folded_names = tuple(name.casefold() for name in self._names)
+        self._positions = {pk: index for index, pk in enumerate(self._ids)}
+
+    @classmethod
+    def load(cls, version):
+        return cls(version, Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, pk):
+        return pk in self._positions
+
+    def _entry(self, index):
+        return CatalogIngredient(
+            self._ids[index], self._names[index], self._units[index]
+        )
+
+    def all(self):
+        return [self._entry(index) for index in range(len(self))]
+
+    def get(self, pk):
+        index = self._positions.get(pk)
+        if index is None:
+            return None
+        return self._entry(index)
+
+    def search(self, name):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        needle = name.strip().casefold()
+        if not needle:
+            return self.all()
+
+        start = bisect_left(self._folded_names, needle)
+        end = start
+        while (end < len(self)
+               and self._folded_names[end].startswith(needle)):
+            end += 1
+
+        result = [self._entry(index) for index in range(start, end)]
+        result.extend(
+            self._entry(index)
+            for index, folded_name in enumerate(self._folded_names)
+            if (index < start or index >= end) and needle in folded_name
+        )
+        return result
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog_version():
+    """Метка из общего кеша, без него — состояние таблицы.
+
+    Метку в кеше процесса не сбрасывают ни другие воркеры, ни
+    load_ingredients, поэтому без общего кеша версия считается
+    одним агрегатом: вставки и удаления меняют число строк и
+    последний id, правки — updated_at.
+    """
+    if versions_are_shared():
+        return get_versions([CATALOG_VERSION_CACHE_KEY])[0]
+    return tuple(Ingredient.objects.aggregate(
+        count=Count('id'), last_id=Max('id'), updated_at=Max('updated_at')
+    ).values())
+
+
+def get_catalog():
+    global _catalog
+
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _catalog_lock:
+            if _catalog is None or _catalog.version != version:
+                _catalog = IngredientCatalog.load(version)
+            catalog = _catalog
+    return catalog
+
+
+def invalidate_catalog(**kwargs):
+    """Обработчик post_save/post_delete для Ingredient.
+
+    Версия каталога — метка времени, она же служит Last-Modified
+    для выдачи ингредиентов.
+    """
+    bump_versions(CATALOG_VERSION_CACHE_KEY)
@@ -0,0 +1,61 @@
+from operator import itemgetter
+
+from backend.fast_serializers import FastSerializer, UrlBuilder
+from recipes_models.models import Recipe, RecipeIngredient
+from users.fast_serializers import USER_COLUMNS, get_user_plan
+
+
+RECIPE_COLUMNS = (
+    'id', 'created_at', 'name', 'image', 'image_thumbnails', 'text',
+    'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+) + tuple(f'author__{column}' for column in USER_COLUMNS)
+
+
+def get_ingredients(recipe_ids):
+    """Ингредиенты рецептов в порядке добавления, одним запросом."""
+    ingredients = {}
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    )
+    for recipe_id, pk, name, measurement_unit, amount in rows:
+        ingredients.setdefault(recipe_id, []).append({
+            'id': pk,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+class FastRecipeSerializer(FastSerializer):
+    """Быстрый аналог RecipeListSerializer.
+
+    Флаги is_favorited и is_in_shopping_cart берутся из аннотаций
+    RecipeViewSet.get_queryset, created_at выбирается для курсора
+    keyset-пагинации и в выдачу не входит.
+    """
+
+    columns = RECIPE_COLUMNS
+
+    def get_plan(self, rows):
+        request = self.context['request']
+        urls = UrlBuilder(request, Recipe._meta.get_field('image').storage)
+        ingredients = get_ingredients([row['id'] for row in rows])
+        author_plan = get_user_plan(request, prefix='author__')
+        return (
+            ('id', itemgetter('id')),
+            ('author',
+             lambda row: {key: get(row) for key, get in author_plan}),
+            ('name', itemgetter('name')),
+            ('image', lambda row: urls.file_url(row['image'])),
+            ('image_srcset',
+             lambda row: urls.srcset(row['image'], row['image_thumbnails'])),
+            ('text', itemgetter('text')),
+            ('cooking_time', itemgetter('cooking_time')),
+            ('ingredients', lambda row: ingredients.get(row['id'], [])),
+            ('is_favorited', itemgetter('is_favorited')),
+            ('is_in_shopping_cart', itemgetter('is_in_shopping_cart')),
+        )
@@ -0,0 +1,55 @@
+from decimal import Decimal, InvalidOperation
+
+from django_filters import rest_framework as filters
+
+from recipes_models.models import Recipe
+
+
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def has_user_filters(request):
+    """Отфильтрована ли выдача по избранному или корзине пользователя."""
+    for name in USER_FILTERS:
+        for value in request.query_params.getlist(name):
+            try:
+                if Decimal(value) == 1:
+                    return True
+            except InvalidOperation:
+                pass
+    return False
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class RecipeFilter(filters.FilterSet):
+    """Фильтры ленты рецептов.
+
+    is_favorited и is_in_shopping_cart фильтруют по аннотациям Exists()
+    из RecipeViewSet.get_queryset, поэтому комбинации фильтров не дают
+    дубликатов и не требуют distinct().
+    """
+
+    author = NumberInFilter(field_name='author_id')
+    min_cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte'
+    )
+    max_cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte'
+    )
+    is_favorited = filters.NumberFilter(method='filter_user_flag')
+    is_in_shopping_cart = filters.NumberFilter(method='filter_user_flag')
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'author', 'min_cooking_time', 'max_cooking_time',
+            'is_favorited', 'is_in_shopping_cart',
+        )
+
+    def filter_user_flag(self, queryset, name, value):
+        if value == 1 and self.request.user.is_authenticated:
+            return queryset.filter(**{name: True})
+        return queryset
@@ -0,0 +1,263 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes_models.models import Recipe, ShoppingCart
+from users_models.models import CustomUser
+
+
+# Название, путь и нужна ли авторизация
+ENDPOINTS = (
+    ('recipes', '/api/recipes/?limit=10', False),
+    ('recipes_auth', '/api/recipes/?limit=10', True),
+    ('recipes_cursor', '/api/recipes/?limit=10&cursor=', False),
+    ('recipes_favorited', '/api/recipes/?limit=10&is_favorited=1', True),
+    ('recipe_detail', '/api/recipes/{recipe_id}/', False),
+    ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+    ('download_shopping_cart', '/api/recipes/download_shopping_cart/', True),
+    ('ingredients_search', '/api/ingredients/?name=со', False),
+    ('users', '/api/users/?limit=10', False),
+)
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    index = max(0, min(len(values) - 1, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def read_rss_kb(pid, children=False):
+    """VmRSS процесса и, с children, всех его потомков в килобайтах."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            rss = next(
+                int(line.split()[1]) for line in status
+                if line.startswith('VmRSS:')
+            )
+    except (OSError, StopIteration):
+        return None
+    if children:
+        try:
+            with open(f'/proc/{pid}/task/{pid}/children') as file:
+                child_pids = file.read().split()
+        except OSError:
+            child_pids = []
+        for child in child_pids:
+            # Потомок мог завершиться между чтениями /proc
+            child_rss = read_rss_kb(child, children=True)
+            if child_rss is not None:
+                rss += child_rss
+    return rss
+
+
+def get_rss(pid='self', children=False):
+    """Резидентная память процесса в мегабайтах по /proc, если он есть."""
+    rss = read_rss_kb(pid, children)
+    if rss is None:
+        return None
+    return round(rss / 1024, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку p50/p95/p99, число SQL-запросов и память '
+        'на основных эндпоинтах; результат сохраняется в JSON '
+        'для сравнения между коммитами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            choices=[name for name, _, _ in ENDPOINTS],
+            help='Замерять только эти эндпоинты'
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя для авторизованных запросов, '
+                           'по умолчанию — владелец самой большой корзины'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--url', help='Адрес запущенного сервера, например '
+                          'http://127.0.0.1:8000; без него запросы идут '
+                          'через тестовый клиент Django в этом процессе'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Параллельных запросов в режиме --url'
+        )
+        parser.add_argument(
+            '--server-pid', type=int,
+            help='PID мастера gunicorn для замера памяти в режиме --url'
+        )
+        parser.add_argument('--label', help='Метка прогона, например коммит')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        recipe = Recipe.objects.order_by('-id').first()
+        if recipe is None:
+            raise CommandError('No recipes, run generate_fixtures first')
+
+        if options['url']:
+            send = self.http_sender(options['url'], user)
+        else:
+            send = self.client_sender(user)
+
+        results = {}
+        for name, path, auth in ENDPOINTS:
+            if options['endpoints'] and name not in options['endpoints']:
+                continue
+            path = path.format(recipe_id=recipe.id)
+            results[name] = self.measure(send, path, auth, options)
+            self.stdout.write(self.format_result(name, results[name]))
+
+        report = {
+            'label': options['label'],
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'mode': 'http' if options['url'] else 'client',
+            'requests': options['requests'],
+            'concurrency': options['concurrency'] if options['url'] else 1,
+            'dataset': {
+                'users': CustomUser.objects.count(),
+                'recipes': Recipe.objects.count(),
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def get_user(self, email):
+        if email:
+            user = CustomUser.objects.filter(email=email).first()
+        else:
+            cart = ShoppingCart.objects.values('author_id').annotate(
+                rows=Count('id')
+            ).order_by('-rows').first()
+            user = cart and CustomUser.objects.get(pk=cart['author_id'])
+            user = user or CustomUser.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('No users, run generate_fixtures first')
+        return user
+
+    def client_sender(self, user):
+        clients = {False: APIClient(), True: APIClient()}
+        clients[True].force_authenticate(user)
+
+        def send(path, auth):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = clients[auth].get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            return elapsed, response.status_code, len(queries)
+
+        send.rss = get_rss
+        send.concurrent = False
+        return send
+
+    def http_sender(self, url, user):
+        import requests
+
+        token, _ = Token.objects.get_or_create(user=user)
+        sessions = {False: requests.Session(), True: requests.Session()}
+        sessions[True].headers['Authorization'] = f'Token {token.key}'
+        url = url.rstrip('/')
+
+        def send(path, auth):
+            started = time.perf_counter()
+            response = sessions[auth].get(url + path)
+            response.content
+            return time.perf_counter() - started, response.status_code, None
+
+        send.rss = lambda: None
+        send.concurrent = True
+        return send
+
+    def measure(self, send, path, auth, options):
+        for _ in range(options['warmup']):
+            send(path, auth)
+
+        def run(_):
+            if options['cold']:
+                cache.clear()
+            return send(path, auth)
+
+        started = time.perf_counter()
+        if send.concurrent and options['concurrency'] > 1:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                samples = list(pool.map(run, range(options['requests'])))
+        else:
+            samples = [run(index) for index in range(options['requests'])]
+        wall_time = time.perf_counter() - started
+
+        latencies = sorted(sample[0] * 1000 for sample in samples)
+        statuses = sorted({sample[1] for sample in samples})
+        queries = [sample[2] for sample in samples if sample[2] is not None]
+        if options['server_pid']:
+            rss = get_rss(options['server_pid'], children=True)
+        else:
+            rss = send.rss()
+        return {
+            'path': path,
+            'auth': auth,
+            'status': statuses,
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'rps': round(len(samples) / wall_time, 1),
+            'queries': max(queries) if queries else None,
+            'rss_mb': rss,
+        }
+
+    @staticmethod
+    def format_result(name, result):
+        return (
+            f'{name:<24} p50 {result["p50_ms"]:8.2f} ms  '
+            f'p95 {result["p95_ms"]:8.2f} ms  '
+            f'p99 {result["p99_ms"]:8.2f} ms  '
+            f'queries {result["queries"]!s:>4}  '
+            f'rss {result["rss_mb"]!s:>7} MB  status {result["status"]}'
+        )
+
+    def compare(self, path, results):
+        if not os.path.exists(path):
+            raise CommandError(f'No such file: {path}')
+        with open(path) as file:
+            previous = json.load(file)['endpoints']
+        self.stdout.write(f'Compared with {path}:')
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            changes = []
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+                before = previous[name][metric]
+                change = ((result[metric] - before) / before * 100
+                          if before else 0)
+                changes.append(f'{metric} {change:+.0f}%')
+            changes.append(
+                f'queries {previous[name]["queries"]} -> {result["queries"]}'
+            )
+            self.stdout.write(f'{name:<24} ' + ', '.join(changes))
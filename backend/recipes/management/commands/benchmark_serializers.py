@@ -0,0 +1,104 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from backend.renderers import FastJSONRenderer
+from recipes.views import RecipeViewSet
+from users.views import SubscriptionsView, UserListCreateView
+from users_models.models import CustomUser
+
+
+# Название, представление, путь запроса
+PAYLOADS = (
+    ('recipes', RecipeViewSet, '/api/recipes/'),
+    ('users', UserListCreateView, '/api/users/'),
+    ('subscriptions', SubscriptionsView,
+     '/api/users/subscriptions/?recipes_limit=3'),
+)
+
+
+def make_view(view_class, path, user):
+    request = Request(RequestFactory().get(path))
+    request.user = user
+    view = view_class()
+    view.request = request
+    view.args = ()
+    view.kwargs = {}
+    view.format_kwarg = None
+    view.action = 'list'
+    return view
+
+
+def serialize(view, limit):
+    """Страница из limit объектов: выборка и сериализация."""
+    return view.get_serializer(view.get_queryset()[:limit], many=True).data
+
+
+def measure(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает выборку, сериализацию и рендеринг страницы через '
+        'сериализаторы DRF и быстрые сериализаторы по строкам .values() '
+        'и проверяет, что ответы совпадают байт в байт'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50,
+                            help='Объектов на странице')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--user', help='Email пользователя для запросов, по умолчанию '
+                           'пользователь с наибольшим числом подписок'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        limit, repeat = options['limit'], options['repeat']
+        failed = False
+        for name, view_class, path in PAYLOADS:
+            results = {}
+            for mode, fast, renderer in (('drf', False, JSONRenderer()),
+                                         ('fast', True, FastJSONRenderer())):
+                with override_settings(FAST_READ_SERIALIZERS=fast):
+                    view = make_view(view_class, path, user)
+                    serialize_ms, data = measure(
+                        lambda: serialize(view, limit), repeat
+                    )
+                render_ms, content = measure(
+                    lambda: renderer.render(data), repeat
+                )
+                results[mode] = (serialize_ms, render_ms, content)
+
+            drf, fast = results['drf'], results['fast']
+            identical = drf[2] == fast[2]
+            failed = failed or not identical
+            self.stdout.write(
+                f'{name:<14} drf {drf[0]:7.2f} + {drf[1]:6.2f} ms  '
+                f'fast {fast[0]:7.2f} + {fast[1]:6.2f} ms  '
+                f'x{(drf[0] + drf[1]) / (fast[0] + fast[1]):.1f}  '
+                f'{len(fast[2])} bytes  '
+                f'{"identical" if identical else "DIFFERENT"}'
+            )
+        if failed:
+            raise CommandError('Fast serializers output differs')
+
+    def get_user(self, email):
+        if email:
+            user = CustomUser.objects.filter(email=email).first()
+        else:
+            user = CustomUser.objects.annotate(
+                subscriptions=Count('follower')
+            ).order_by('-subscriptions', 'id').first()
+        if user is None:
+            raise CommandError('No users, run generate_fixtures first')
+        return user
@@ -0,0 +1,74 @@
+import base64
+import io
+import os
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from PIL import Image
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.request import Request
+
+from backend.uploads import ImageUploadField, ImageUploadHandler
+
+
+def make_png(size):
+    """PNG из шума, который почти не сжимается и весит около size байт."""
+    side = int((size / 3) ** 0.5)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def base64_request(factory, content):
+    return factory.post(
+        '/api/recipes/',
+        data={'image': 'data:image/png;base64,'
+                       + base64.b64encode(content).decode()},
+        content_type='application/json'
+    )
+
+
+def multipart_request(factory, content):
+    request = factory.post(
+        '/api/recipes/', data={'image': io.BytesIO(content)}
+    )
+    request.upload_handlers = [ImageUploadHandler(request, ('image',))]
+    return request
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пиковую память и время разбора изображения '
+        'в base64 из JSON и файлом из multipart/form-data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=float, nargs='+', default=[1, 5],
+            help='Размеры изображений в мегабайтах'
+        )
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        for size in options['sizes']:
+            content = make_png(int(size * 1024 * 1024))
+            for name, build in (('base64', base64_request),
+                                ('multipart', multipart_request)):
+                request = build(factory, content)
+                tracemalloc.start()
+                started = time.perf_counter()
+                data = Request(
+                    request, parsers=[JSONParser(), MultiPartParser()]
+                ).data
+                image = ImageUploadField().to_internal_value(data['image'])
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                image.close()
+                self.stdout.write(
+                    f'{name:<10} {len(content) / 2 ** 20:6.1f} MB  '
+                    f'peak {peak / 2 ** 20:7.1f} MB  {elapsed * 1000:7.1f} ms'
+                )
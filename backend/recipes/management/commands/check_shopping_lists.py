@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes_models.models import ShoppingListItem
+from recipes.shopping_list import compute_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает списки покупок по корзинам и сравнивает '
+        'их с таблицей ShoppingListItem'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Перезаписать расходящиеся строки пересчитанными значениями'
+        )
+
+    def handle(self, *args, **options):
+        expected = compute_shopping_lists()
+        stored = {
+            (user_id, ingredient_id): (pk, amount)
+            for pk, user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'id', 'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+
+        missing = [key for key in expected if key not in stored]
+        extra = [key for key in stored if key not in expected]
+        changed = [
+            key for key in expected
+            if key in stored and stored[key][1] != expected[key]
+        ]
+
+        for user_id, ingredient_id in missing:
+            self.stdout.write(
+                f'missing: user={user_id} ingredient={ingredient_id} '
+                f'amount={expected[user_id, ingredient_id]}'
+            )
+        for user_id, ingredient_id in extra:
+            self.stdout.write(
+                f'extra: user={user_id} ingredient={ingredient_id} '
+                f'amount={stored[user_id, ingredient_id][1]}'
+            )
+        for key in changed:
+            self.stdout.write(
+                f'changed: user={key[0]} ingredient={key[1]} '
+                f'stored={stored[key][1]} expected={expected[key]}'
+            )
+
+        if not (missing or extra or changed):
+            self.stdout.write(self.style.SUCCESS(
+                f'Shopping lists are consistent ({len(stored)} rows)'
+            ))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'{len(missing)} missing, {len(extra)} extra, '
+            f'{len(changed)} changed rows'
+        ))
+        if not options['fix']:
+            return
+
+        with transaction.atomic():
+            ShoppingListItem.objects.filter(
+                id__in=[stored[key][0] for key in extra]
+            ).delete()
+            ShoppingListItem.objects.bulk_update(
+                [ShoppingListItem(id=stored[key][0], amount=expected[key])
+                 for key in changed],
+                ['amount'], batch_size=1000
+            )
+            ShoppingListItem.objects.bulk_create(
+                [ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                                  amount=expected[user_id, ingredient_id])
+                 for user_id, ingredient_id in missing],
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS('Shopping lists rebuilt'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.transfer import iter_export_records, open_file, write_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, рецепты с ингредиентами и картинками, '
+        'избранное, корзины и подписки в NDJSON для import_recipes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help="Файл для выгрузки, '-' — stdout, .gz — со сжатием"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with open_file(options['path'], 'w') as file:
+            count = write_records(iter_export_records(), file)
+        if options['path'] != '-':
+            self.stdout.write(
+                f'{count} records exported '
+                f'in {time.perf_counter() - started:.1f} s'
+            )
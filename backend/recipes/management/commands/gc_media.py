@@ -0,0 +1,59 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.storage import get_reference_counts
+
+
+def iter_files(storage, path=''):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from iter_files(storage, os.path.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из медиа-хранилища файлы, на которые не ссылается '
+        'ни один рецепт или аватар, включая их миниатюры'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы без ссылок, не удаляя их'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе стольких секунд: ссылка '
+                 'на только что загруженный файл может быть ещё '
+                 'не сохранена'
+        )
+
+    def handle(self, *args, **options):
+        counts = get_reference_counts()
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+
+        scanned = orphaned = freed = 0
+        for name in iter_files(default_storage):
+            scanned += 1
+            if counts[name]:
+                continue
+            if default_storage.get_modified_time(name) > threshold:
+                continue
+            orphaned += 1
+            freed += default_storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+
+        shared = sum(1 for count in counts.values() if count > 1)
+        self.stdout.write(
+            f'{scanned} files, {len(counts)} referenced, {shared} shared, '
+            f'{orphaned} orphaned ({freed} bytes)'
+        )
@@ -0,0 +1,153 @@
+import io
+import random
+import secrets
+import time
+from array import array
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from recipes_models.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart
+)
+from users_models.models import CustomUser, Subscription
+from recipes.transfer import refresh_after_bulk_load
+
+
+FIXTURE_PASSWORD = 'fixture-password'
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1280, 960), (200, 120, 60)).save(buffer, 'JPEG')
+    # Хранилище адресует файлы по содержимому, все рецепты ссылаются
+    # на один файл
+    return default_storage.save('recipes/fixture.jpg',
+                                ContentFile(buffer.getvalue()))
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, рецепты, избранное, корзины '
+        'и подписки заданного объёма для нагрузочных замеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients', type=int, default=8,
+            help='Ингредиентов в рецепте'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=10,
+            help='Рецептов в избранном у каждого пользователя'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Рецептов в корзине у каждого пользователя'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Подписок у каждого пользователя'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < options['ingredients']:
+            raise CommandError(
+                'Not enough ingredients, run load_ingredients first'
+            )
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                options['recipes'], user_ids, ingredient_ids,
+                options['ingredients']
+            )
+            self.create_relations(Favorite, 'author_id', 'recipe_id',
+                                  user_ids, recipe_ids, options['favorites'])
+            self.create_relations(ShoppingCart, 'author_id', 'recipe_id',
+                                  user_ids, recipe_ids, options['carts'])
+            self.create_relations(Subscription, 'user_id', 'author_id',
+                                  user_ids, user_ids,
+                                  options['subscriptions'])
+            refresh_after_bulk_load(
+                user_ids if options['carts'] else (), stdout=self.stdout
+            )
+
+        self.stdout.write(
+            f'{len(user_ids)} users, {len(recipe_ids)} recipes '
+            f'in {time.perf_counter() - started:.1f} s, '
+            f'password: {FIXTURE_PASSWORD}'
+        )
+
+    def create_users(self, count):
+        # Метка запуска делает email и username уникальными
+        # при повторной генерации в той же БД
+        token = secrets.token_hex(4)
+        password = make_password(FIXTURE_PASSWORD)
+        user_ids = array('q')
+        for start in range(0, count, self.batch_size):
+            users = CustomUser.objects.bulk_create(
+                CustomUser(
+                    email=f'fixture-{token}-{index}@example.com',
+                    username=f'fixture-{token}-{index}',
+                    first_name='Fixture', last_name=str(index),
+                    password=password,
+                )
+                for index in range(start, min(start + self.batch_size, count))
+            )
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    def create_recipes(self, count, user_ids, ingredient_ids,
+                       ingredients_per_recipe):
+        image = make_image()
+        recipe_ids = array('q')
+        for start in range(0, count, self.batch_size):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=self.random.choice(user_ids),
+                    name=f'Fixture recipe {index}',
+                    text='Synthetic recipe for load testing.',
+                    cooking_time=self.random.randint(5, 180),
+                    image=image,
+                )
+                for index in range(start, min(start + self.batch_size, count))
+            )
+            RecipeIngredient.objects.bulk_create(
+                (RecipeIngredient(recipe_id=recipe.pk,
+                                  ingredient_id=ingredient_id,
+                                  amount=self.random.randint(1, 500))
+                 for recipe in recipes
+                 for ingredient_id in self.random.sample(
+                     ingredient_ids, ingredients_per_recipe)),
+                batch_size=self.batch_size
+            )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+        return recipe_ids
+
+    def create_relations(self, model, owner_field, target_field, owner_ids,
+                         target_ids, per_owner):
+        per_owner = min(per_owner, len(target_ids))
+        rows = []
+        for owner_id in owner_ids:
+            for target_id in self.random.sample(target_ids, per_owner):
+                if model is Subscription and target_id == owner_id:
+                    continue
+                rows.append(model(**{owner_field: owner_id,
+                                     target_field: target_id}))
+            if len(rows) >= self.batch_size:
+                model.objects.bulk_create(rows, ignore_conflicts=True)
+                rows = []
+        model.objects.bulk_create(rows, ignore_conflicts=True)
@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from backend.images import THUMBNAIL_SPECS, generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры изображений рецептов и аватаров, для которых '
+        'их ещё нет, например после загрузки данных в обход сигналов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать миниатюры для всех изображений'
+        )
+
+    def handle(self, *args, **options):
+        for label, spec in THUMBNAIL_SPECS.items():
+            model = apps.get_model(label)
+            rows = model.objects.exclude(
+                **{spec.field: ''}
+            ).exclude(
+                **{f'{spec.field}__isnull': True}
+            ).values_list('pk', spec.field, spec.thumbnails_field)
+
+            generated = 0
+            for pk, name, thumbnails in rows.iterator():
+                if not options['force'] and (
+                        thumbnails or {}).get('source') == name:
+                    continue
+                generate_thumbnails(label, pk, name)
+                generated += 1
+
+            self.stdout.write(f'{model.__name__}: {generated} images')
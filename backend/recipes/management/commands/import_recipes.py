@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.transfer import (
+    Importer, iter_batches, open_file, refresh_after_bulk_load
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает NDJSON из export_recipes. Пользователи и рецепты '
+        'получают новые id, ссылки на них пересчитываются; '
+        'пользователи с существующим email не создаются заново'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help="Файл для загрузки, '-' — stdin, .gz — со сжатием"
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Процессов для декодирования и проверки изображений'
+        )
+        parser.add_argument(
+            '--thumbnails', action='store_true',
+            help='Сразу создать миниатюры загруженных изображений'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        workers = options['workers']
+        pool = (ProcessPoolExecutor(max_workers=workers) if workers > 1
+                else nullcontext())
+
+        with pool, transaction.atomic():
+            importer = Importer(
+                (lambda func, items: pool.map(func, items, chunksize=16))
+                if workers > 1 else map
+            )
+            with open_file(options['path'], 'r') as file:
+                try:
+                    for record_type, batch in iter_batches(
+                            file, options['batch_size']):
+                        importer.import_batch(record_type, batch)
+                except (ValueError, KeyError, OSError) as error:
+                    raise CommandError(f'Invalid record: {error!r}')
+
+            refresh_after_bulk_load(
+                importer.cart_user_ids, importer.existing_user_ids,
+                importer.ingredients_created, stdout=self.stdout
+            )
+
+        if options['thumbnails']:
+            call_command('generate_thumbnails', stdout=self.stdout)
+
+        self.stdout.write(
+            ', '.join(f'{count} {name}' for name, count
+                      in importer.stats.items())
+            + f' in {time.perf_counter() - started:.1f} s'
+        )
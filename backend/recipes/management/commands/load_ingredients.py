@@ -0,0 +1,121 @@
+import csv
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from recipes_models.models import Ingredient
+from recipes.cache import SHARED_VERSION_CACHE_KEY
+from recipes.catalog import invalidate_catalog
+from backend.conditional import bump_versions
+
+
+READ_SIZE = 64 * 1024
+CSV_HEADER = ['name', 'measurement_unit']
+
+
+def iter_json(file):
+    """Элементы JSON-массива верхнего уровня по одному, без json.load."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Expected a JSON array')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise CommandError('Unexpected end of JSON data')
+            buffer += chunk
+            continue
+        yield item['name'], item['measurement_unit']
+        buffer = buffer[end:]
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row and row != CSV_HEADER:
+            yield row[0], row[1]
+
+
+READERS = {'.json': iter_json, '.csv': iter_csv}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из JSON или CSV. Ингредиент определяется '
+        'названием и единицей измерения, создаются только новые пары, '
+        'повторный запуск ничего не меняет'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.json'),
+            help='Файл .json (массив объектов name, measurement_unit) '
+                 'или .csv (строки name,measurement_unit)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f'Unsupported file type: {path}')
+
+        started = time.perf_counter()
+        # Словарь как упорядоченное множество: id идут в порядке файла
+        ingredients = {}
+        try:
+            with open(path, encoding='utf-8') as file:
+                for name, measurement_unit in reader(file):
+                    name = name.strip()
+                    if name:
+                        ingredients[name, measurement_unit.strip()] = None
+        except OSError as error:
+            raise CommandError(error)
+        read_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        database = options['database']
+        with transaction.atomic(using=database):
+            existing = set(
+                Ingredient.objects.using(database).values_list(
+                    'name', 'measurement_unit'
+                )
+            )
+            created = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in ingredients
+                if (name, measurement_unit) not in existing
+            ]
+            # Конфликт возможен только с параллельной загрузкой
+            Ingredient.objects.using(database).bulk_create(
+                created,
+                batch_size=options['batch_size'],
+                ignore_conflicts=True,
+            )
+            if created:
+                # bulk_create не отправляет post_save, каталог и кеш
+                # выдачи рецептов сбрасываются явно после коммита
+                invalidate_catalog()
+                bump_versions(SHARED_VERSION_CACHE_KEY)
+        write_time = time.perf_counter() - started
+
+        if options['verbosity'] < 1:
+            return
+        self.stdout.write(
+            f'{len(ingredients)} ingredients: {len(created)} created, '
+            f'{len(ingredients) - len(created)} unchanged '
+            f'(read {read_time * 1000:.0f} ms, '
+            f'write {write_time * 1000:.0f} ms)'
+        )
@@ -0,0 +1,57 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.core.management.base import BaseCommand
+
+from recipes_models.models import Favorite, Recipe, ShoppingCart
+from users_models.models import CustomUser, Subscription
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'cart_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Subscription, 'author'),
+)
+
+
+def actual_count(related_model, fk):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{fk: OuterRef('pk')}
+            ).order_by().values(fk).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики рецептов и пользователей '
+        'с таблицами, по которым они считаются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, не исправляя их'
+        )
+
+    def handle(self, *args, **options):
+        for model, field, related_model, fk in COUNTERS:
+            stale_ids = list(model.objects.annotate(
+                actual=actual_count(related_model, fk)
+            ).exclude(
+                **{field: F('actual')}
+            ).values_list('pk', flat=True))
+
+            if stale_ids and not options['dry_run']:
+                model.objects.filter(pk__in=stale_ids).update(
+                    **{field: actual_count(related_model, fk)}
+                )
+
+            self.stdout.write(
+                f'{model.__name__}.{field}: {len(stale_ids)} stale rows'
+            )
@@ -0,0 +1,39 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListTextRenderer(BaseRenderer):
+    """Согласование формата списка покупок.
+
+    Сам список отдаётся потоком в обход рендерера, ошибки
+    DownloadShoppingCartView отдаёт в JSON.
+    """
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Неподходящий Accept получает список в txt, а не 406.
+
+    Клиенты API по умолчанию шлют Accept: application/json,
+    до поддержки csv список для них отдавался текстом.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
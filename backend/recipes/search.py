@@ -0,0 +1,40 @@
+from django.db import connection, transaction
+
+from recipes_models.models import Ingredient
+from .catalog import get_catalog
+
+
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+
+
+def search_ingredients(name):
+    """Поиск ингредиентов для автодополнения.
+
+    Совпадения по началу названия идут раньше совпадений по подстроке,
+    регистр не учитывается, в том числе для кириллицы. Обе выборки
+    строятся по каталогу в памяти процесса без обращения к БД.
+    Если ничего не найдено, на PostgreSQL выполняется нечёткий поиск
+    по триграммам.
+    """
+    result = get_catalog().search(name)
+    if result or not name.strip() or connection.vendor != 'postgresql':
+        return result
+    return _search_trigram(name.strip())
+
+
+def _search_trigram(name):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    # name %> запрос идёт по GIN-индексу ingredient_name_trgm_idx,
+    # порог оператора задаётся на время транзакции
+    queryset = Ingredient.objects.filter(
+        name__trigram_word_similar=name
+    ).annotate(
+        similarity=TrigramWordSimilarity(name, 'name'),
+    ).order_by('-similarity', 'name')
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+            [str(TRIGRAM_SIMILARITY_THRESHOLD)]
+        )
+        return list(queryset)
@@ -1,9 +1,20 @@
+import json
+
 from rest_framework import serializers
+from django.db import transaction
+from django.db.models import F, prefetch_related_objects
 from recipes_models.models import (
     Ingredient, RecipeIngredient, Recipe
 )
 from users.serializers import UserListSerializer
-from drf_extra_fields.fields import Base64ImageField
+from users_models.models import CustomUser
+from backend.images import build_srcset
+from backend.instrumentation import MeasuredSerializerMixin
+from backend.uploads import ImageUploadField
+from .catalog import get_catalog
+from .shopping_list import (
+    shopping_lists_handled, update_recipe_in_shopping_lists
+)
 
 
 MIN_INGREDIENT_AMOUNT = 1
@@ -12,7 +23,8 @@ MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 32000
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(MeasuredSerializerMixin,
+                           serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
@@ -31,36 +43,65 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(MeasuredSerializerMixin,
+                           serializers.ModelSerializer):
     author = UserListSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         source='recipeingredient_set', many=True, read_only=True
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'author', 'name', 'image', 'text', 'cooking_time',
-            'ingredients', 'is_favorited', 'is_in_shopping_cart',
+            'id', 'author', 'name', 'image', 'image_srcset', 'text',
+            'cooking_time', 'ingredients', 'is_favorited',
+            'is_in_shopping_cart',
+        )
+
+    def get_image_srcset(self, obj):
+        return build_srcset(
+            self.context['request'], obj.image, obj.image_thumbnails
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return obj.favorite_recipes.filter(author=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return obj.shopping_cart.filter(author=user).exists()
 
 
+def find_missing_ingredient_ids(ingredient_ids):
+    """Id ингредиентов, которых нет ни в каталоге, ни в БД.
+
+    Каталог в памяти процесса отвечает без запросов; id, которых в нём
+    нет, перепроверяются одним запросом id__in на случай, если снимок
+    каталога ещё не обновился.
+    """
+    catalog = get_catalog()
+    unknown_ids = [idx for idx in ingredient_ids if idx not in catalog]
+    if not unknown_ids:
+        return []
+    existing_ids = set(Ingredient.objects.filter(
+        id__in=unknown_ids
+    ).values_list('id', flat=True))
+    return [idx for idx in unknown_ids if idx not in existing_ids]
+
+
 class IngredientAmountSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         min_value=MIN_INGREDIENT_AMOUNT,
         max_value=MAX_INGREDIENT_AMOUNT
@@ -71,8 +112,9 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount']
 
 
-class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+class RecipeCreateUpdateSerializer(MeasuredSerializerMixin,
+                                   serializers.ModelSerializer):
+    image = ImageUploadField()
     ingredients = serializers.ListField(
         child=serializers.DictField(),
         write_only=True
@@ -92,25 +134,43 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             'ingredients': {'required': True},
         }
 
+    def to_internal_value(self, data):
+        # В multipart/form-data список ингредиентов передаётся строкой JSON
+        if hasattr(data, 'getlist'):
+            data = data.dict()
+            if isinstance(data.get('ingredients'), str):
+                try:
+                    data['ingredients'] = json.loads(data['ingredients'])
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {'ingredients': ['Invalid JSON']}
+                    )
+        return super().to_internal_value(data)
+
     def validate_ingredients(self, value):
         if not value:
             raise serializers.ValidationError(
                 'At least one ingredient is required'
             )
 
-        ingredient_ids = [item['id'] for item in value]
+        serializer = IngredientAmountSerializer(many=True, data=value)
+        serializer.is_valid(raise_exception=True)
+        ingredients = serializer.validated_data
+
+        ingredient_ids = [item['id'] for item in ingredients]
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 'Duplicate ingredients'
             )
 
-        for idx in ingredient_ids:
-            if not Ingredient.objects.filter(id=idx).exists():
-                raise serializers.ValidationError('Ingredient does not exist')
+        missing_ids = find_missing_ingredient_ids(ingredient_ids)
+        if missing_ids:
+            raise serializers.ValidationError(
+                'Ingredients do not exist: '
+                + ', '.join(str(idx) for idx in missing_ids)
+            )
 
-        serializer = IngredientAmountSerializer(many=True, data=value)
-        serializer.is_valid(raise_exception=True)
-        return value
+        return ingredients
 
     def validate(self, data):
         request = self.context['request']
@@ -130,26 +190,30 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Image cannot be null')
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(
-            author=self.context['request'].user,
-            **validated_data
-        )
+        author = self.context['request'].user
+        recipe = Recipe.objects.create(author=author, **validated_data)
         self._handle_ingredients(recipe, ingredients_data)
+        CustomUser.objects.filter(pk=author.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
         if ingredients_data is None:
             raise serializers.ValidationError('Ingredients cannot be null')
         instance = super().update(instance, validated_data)
-        if ingredients_data is not None:
-            instance.ingredients.clear()
-            self._handle_ingredients(instance, ingredients_data)
+        self._sync_ingredients(instance, ingredients_data)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'recipeingredient_set__ingredient'
+        )
         return RecipeListSerializer(instance, context=self.context).data
 
     def _handle_ingredients(self, recipe, ingredients_data):
@@ -160,18 +224,66 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                 amount=item['amount']
             ) for item in ingredients_data
         ]
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
-
-
-class RecipeShortSerializer(serializers.ModelSerializer):
+        if recipe_ingredients:
+            RecipeIngredient.objects.bulk_create(recipe_ingredients)
+
+    def _sync_ingredients(self, recipe, ingredients_data):
+        """Приводит ингредиенты рецепта к ingredients_data.
+
+        Вместо удаления и повторной вставки всех строк выполняется
+        не больше одного удаления, одного bulk_update и одного bulk_create.
+        """
+        existing = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in existing.items()
+        }
+        amounts = {item['id']: item['amount'] for item in ingredients_data}
+
+        removed_ids = existing.keys() - amounts.keys()
+        if removed_ids:
+            # Списки покупок меняются ниже одним набором запросов
+            with shopping_lists_handled():
+                RecipeIngredient.objects.filter(
+                    recipe=recipe, ingredient_id__in=removed_ids
+                ).delete()
+
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+
+        self._handle_ingredients(recipe, [
+            item for item in ingredients_data
+            if item['id'] not in existing
+        ])
+
+        update_recipe_in_shopping_lists(recipe, old_amounts, amounts)
+
+
+class RecipeShortSerializer(MeasuredSerializerMixin,
+                            serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_srcset', 'cooking_time']
 
     def get_image(self, obj):
         request = self.context.get('request')
         if obj.image:
             return request.build_absolute_uri(obj.image.url)
         return None
+
+    def get_image_srcset(self, obj):
+        return build_srcset(
+            self.context['request'], obj.image, obj.image_thumbnails
+        )
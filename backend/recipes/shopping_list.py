@@ -0,0 +1,270 @@
+import csv
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import (
+    Case, F, IntegerField, QuerySet, Sum, Value, When
+)
+
+from recipes_models.models import (
+    RecipeIngredient, ShoppingCart, ShoppingListItem
+)
+
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_CSV_HEADER = ('name', 'measurement_unit', 'amount')
+
+_handled_by_caller = ContextVar('shopping_lists_handled', default=False)
+
+
+def get_shopping_list(user):
+    """Готовый список покупок пользователя из ShoppingListItem."""
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+def compute_shopping_lists(user_ids=None):
+    """Списки покупок, посчитанные заново по корзинам.
+
+    Возвращает словарь {(user_id, ingredient_id): amount}.
+    """
+    # Условия в одном filter(), иначе корзины присоединяются дважды
+    # и суммы умножаются
+    if user_ids is None:
+        lookup = {'recipe__shopping_cart__isnull': False}
+    else:
+        lookup = {'recipe__shopping_cart__author_id__in': user_ids}
+    totals = RecipeIngredient.objects.filter(**lookup).values_list(
+        'recipe__shopping_cart__author_id', 'ingredient_id'
+    ).annotate(total=Sum('amount'))
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in totals.iterator(
+            chunk_size=SHOPPING_LIST_CHUNK_SIZE
+        )
+    }
+
+
+@transaction.atomic
+def apply_shopping_list_changes(user_ids, deltas):
+    """Прибавляет deltas {ingredient_id: amount} к спискам user_ids.
+
+    Строки создаются при необходимости, суммы меняются одним UPDATE
+    с F(), строки с нулевой суммой удаляются.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+
+    ShoppingListItem.objects.bulk_create(
+        [ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          amount=0)
+         for user_id in user_ids
+         for ingredient_id, delta in deltas.items() if delta > 0],
+        ignore_conflicts=True
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    items.update(amount=F('amount') + Case(
+        *(When(ingredient_id=ingredient_id, then=Value(delta))
+          for ingredient_id, delta in deltas.items()),
+        output_field=IntegerField()
+    ))
+    items.filter(amount__lte=0).delete()
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+
+
+def add_recipe_to_shopping_list(user_id, recipe_id):
+    apply_shopping_list_changes([user_id], get_recipe_amounts(recipe_id))
+
+
+def remove_recipe_from_shopping_list(user_id, recipe_id):
+    apply_shopping_list_changes([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+def update_recipe_in_shopping_lists(recipe, old_amounts, new_amounts):
+    """Переносит изменение ингредиентов рецепта в списки покупок."""
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    if not any(deltas.values()):
+        return
+    apply_shopping_list_changes(
+        ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('author_id', flat=True),
+        deltas
+    )
+
+
+def remove_recipe_from_all_shopping_lists(recipe):
+    update_recipe_in_shopping_lists(
+        recipe, get_recipe_amounts(recipe.pk), {}
+    )
+
+
+def apply_recipe_ingredient_changes(recipe_id, deltas):
+    apply_shopping_list_changes(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('author_id', flat=True),
+        deltas
+    )
+
+
+@contextmanager
+def shopping_lists_handled():
+    """Удаления внутри блока уже учтены в списках вызывающим кодом.
+
+    Так _sync_ingredients переносит все изменения рецепта одним
+    набором запросов, а не отдельно по каждой удалённой строке.
+    """
+    token = _handled_by_caller.set(True)
+    try:
+        yield
+    finally:
+        _handled_by_caller.reset(token)
+
+
+def started_from(sender, origin):
+    """Удаление начато с самой модели, а не каскадом.
+
+    Каскад от рецепта учитывает subtract_deleted_recipe, строки
+    ShoppingListItem удалённых пользователей и ингредиентов удаляются
+    каскадом вместе с ними.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is sender
+    return isinstance(origin, sender)
+
+
+def remember_previous(sender, instance, raw=False, **kwargs):
+    """Обработчик pre_save для ShoppingCart и RecipeIngredient.
+
+    Запоминает сохранённое состояние изменяемой строки, например
+    при правке в админке, чтобы post_save вычел его из списков.
+    """
+    instance._shopping_list_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._shopping_list_previous = sender.objects.filter(
+        pk=instance.pk
+    ).first()
+
+
+def update_cart_shopping_list(sender, instance, raw=False, **kwargs):
+    """Обработчик post_save для ShoppingCart."""
+    if raw:
+        return
+    previous = getattr(instance, '_shopping_list_previous', None)
+    if previous is not None:
+        if (previous.author_id, previous.recipe_id) == (
+                instance.author_id, instance.recipe_id):
+            return
+        remove_recipe_from_shopping_list(
+            previous.author_id, previous.recipe_id
+        )
+    add_recipe_to_shopping_list(instance.author_id, instance.recipe_id)
+
+
+def subtract_deleted_cart(sender, instance, origin=None, **kwargs):
+    """Обработчик post_delete для ShoppingCart."""
+    if _handled_by_caller.get() or not started_from(sender, origin):
+        return
+    remove_recipe_from_shopping_list(instance.author_id, instance.recipe_id)
+
+
+def update_ingredient_shopping_lists(sender, instance, raw=False, **kwargs):
+    """Обработчик post_save для RecipeIngredient."""
+    if raw:
+        return
+    previous = getattr(instance, '_shopping_list_previous', None)
+    if previous is not None:
+        if previous.recipe_id != instance.recipe_id:
+            apply_recipe_ingredient_changes(
+                previous.recipe_id,
+                {previous.ingredient_id: -previous.amount}
+            )
+            previous = None
+    deltas = Counter({instance.ingredient_id: instance.amount})
+    if previous is not None:
+        deltas.subtract({previous.ingredient_id: previous.amount})
+    if any(deltas.values()):
+        apply_recipe_ingredient_changes(instance.recipe_id, deltas)
+
+
+def subtract_deleted_ingredient(sender, instance, origin=None, **kwargs):
+    """Обработчик post_delete для RecipeIngredient."""
+    if _handled_by_caller.get() or not started_from(sender, origin):
+        return
+    apply_recipe_ingredient_changes(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+def subtract_deleted_recipe(sender, instance, **kwargs):
+    """Обработчик pre_delete для Recipe.
+
+    До каскадного удаления корзин и ингредиентов рецепт вычитается
+    из списков всех, у кого он в корзине.
+    """
+    remove_recipe_from_all_shopping_lists(instance)
+
+
+@transaction.atomic
+def rebuild_shopping_lists(user_ids):
+    """Пересобирает списки покупок пользователей по их корзинам.
+
+    Нужна после массовой загрузки корзин в обход представлений.
+    """
+    user_ids = list(user_ids)
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          amount=amount)
+         for (user_id, ingredient_id), amount
+         in compute_shopping_lists(user_ids).items()),
+        batch_size=1000
+    )
+
+
+def iter_text(items):
+    for name, measurement_unit, total in items:
+        yield f'* {name} ({measurement_unit}) - {total}\n'
+
+
+class _LineBuffer:
+    def write(self, value):
+        return value
+
+
+def iter_csv(items):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(SHOPPING_LIST_CSV_HEADER)
+    for row in items:
+        yield writer.writerow(row)
+
+
+SHOPPING_LIST_WRITERS = {
+    'txt': iter_text,
+    'csv': iter_csv,
+}
@@ -0,0 +1,409 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes_models.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    ShoppingListItem
+)
+from users_models.models import CustomUser, Subscription
+from .catalog import get_catalog
+from .serializers import RecipeCreateUpdateSerializer
+from .shopping_list import compute_shopping_lists
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def create_user(index):
+    return CustomUser.objects.create_user(
+        email=f'user{index}@example.com', username=f'user{index}',
+        first_name='First', last_name='Last', password='Password-12345'
+    )
+
+
+def image_data():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def create_recipe(author, ingredients, amount=10):
+    recipe = Recipe.objects.create(
+        author=author, name='Recipe', text='Text', cooking_time=10,
+        image='recipes/recipe.png'
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryCountTestCase(TestCase):
+    """Основа тестов числа запросов: кеши сбрасываются перед запросом."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, client, method, path, **kwargs):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(path, **kwargs)
+        return response, len(queries)
+
+
+class RecipeQueryCountTests(QueryCountTestCase):
+    """Число запросов ленты и рецепта не зависит от размера страницы."""
+
+    # Рецепты, ингредиенты с названиями; для авторизованного
+    # пользователя ещё подписки и флаги избранного, корзины и подписок
+    LIST_QUERIES = {'anonymous': 3, 'user': 5}
+    # Рецепт и ингредиенты; для авторизованного — подписки и флаги
+    DETAIL_QUERIES = {'anonymous': 2, 'user': 4}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(index) for index in range(4)]
+        ingredients = list(Ingredient.objects.order_by('id')[:5])
+        cls.recipes = [
+            create_recipe(cls.users[index % 4], ingredients)
+            for index in range(20)
+        ]
+        reader = cls.users[0]
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(author=reader, recipe=recipe)
+            ShoppingCart.objects.create(author=reader, recipe=recipe)
+        for author in cls.users[1:]:
+            Subscription.objects.create(user=reader, author=author)
+
+    def get_clients(self):
+        user_client = APIClient()
+        user_client.force_authenticate(self.users[0])
+        return {'anonymous': APIClient(), 'user': user_client}
+
+    def test_list_queries(self):
+        for fast in (False, True):
+            for name, client in self.get_clients().items():
+                for limit in (1, 5, 20):
+                    with self.subTest(fast=fast, client=name, limit=limit):
+                        with override_settings(FAST_READ_SERIALIZERS=fast):
+                            response, queries = self.count_queries(
+                                client, 'get', f'/api/recipes/?limit={limit}'
+                            )
+                        self.assertEqual(response.status_code, 200)
+                        self.assertEqual(len(response.data['results']),
+                                         limit)
+                        self.assertEqual(queries, self.LIST_QUERIES[name])
+
+    def test_detail_queries(self):
+        for fast in (False, True):
+            for name, client in self.get_clients().items():
+                for recipe in self.recipes[:2]:
+                    with self.subTest(fast=fast, client=name,
+                                      recipe=recipe.pk):
+                        with override_settings(FAST_READ_SERIALIZERS=fast):
+                            response, queries = self.count_queries(
+                                client, 'get', f'/api/recipes/{recipe.pk}/'
+                            )
+                        self.assertEqual(response.status_code, 200)
+                        self.assertEqual(len(response.data['ingredients']),
+                                         5)
+                        self.assertEqual(queries, self.DETAIL_QUERIES[name])
+
+
+class ConditionalGetTests(QueryCountTestCase):
+    """ETag выдаются только с общим для воркеров кешем."""
+
+    PATHS = ('/api/recipes/', '/api/ingredients/?name=мука')
+    SHARED_CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(MEDIA_ROOT, 'cache'),
+        }
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipe(create_user(0), Ingredient.objects.order_by('id')[:2])
+
+    def test_no_validators_with_process_cache(self):
+        client = APIClient()
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                response = client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('ETag', response)
+                self.assertNotIn('Last-Modified', response)
+
+    def test_not_modified_with_shared_cache(self):
+        client = APIClient()
+        with self.settings(CACHES=self.SHARED_CACHES):
+            for path in self.PATHS:
+                with self.subTest(path=path):
+                    etag = client.get(path)['ETag']
+                    response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+
+
+class RecipeIngredientValidationTests(QueryCountTestCase):
+    """Проверка ингредиентов рецепта не зависит от их числа."""
+
+    # Версия каталога по таблице и перепроверка неизвестных id
+    QUERIES = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+
+    def post_recipe(self, ingredient_ids):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        get_catalog()
+        return self.count_queries(client, 'post', '/api/recipes/', data={
+            'name': 'Recipe', 'text': 'Text', 'cooking_time': 10,
+            'image': image_data(),
+            'ingredients': [
+                {'id': idx, 'amount': 10} for idx in ingredient_ids
+            ],
+        }, format='json')
+
+    def test_missing_ingredients_in_one_error(self):
+        unknown_base = self.ingredient_ids[-1] + 1000
+        for known, unknown in ((5, 1), (25, 5), (20, 10)):
+            missing_ids = [unknown_base + index for index in range(unknown)]
+            ingredient_ids = self.ingredient_ids[:known] + missing_ids
+            with self.subTest(known=known, unknown=unknown):
+                response, queries = self.post_recipe(ingredient_ids)
+                self.assertEqual(response.status_code, 400)
+                errors = response.data['ingredients']
+                self.assertEqual(len(errors), 1)
+                self.assertEqual(
+                    str(errors[0]), 'Ingredients do not exist: '
+                    + ', '.join(str(idx) for idx in missing_ids)
+                )
+                self.assertEqual(queries, self.QUERIES)
+                self.assertFalse(Recipe.objects.exists())
+
+
+class ShoppingListTestCase(QueryCountTestCase):
+
+    def assert_shopping_lists(self, users):
+        """Списки покупок совпадают с пересчитанными по корзинам."""
+        user_ids = [user.id for user in users]
+        self.assertEqual(
+            {(user_id, ingredient_id): amount
+             for user_id, ingredient_id, amount
+             in ShoppingListItem.objects.filter(
+                 user_id__in=user_ids
+             ).values_list('user_id', 'ingredient_id', 'amount')},
+            compute_shopping_lists(user_ids)
+        )
+
+
+class SyncIngredientsTests(ShoppingListTestCase):
+    """Обновление ингредиентов рецепта и списков покупок."""
+
+    # Количества по индексу ингредиента: исходные и после обновления
+    INITIAL = {0: 10, 1: 20, 2: 30}
+    CASES = {
+        'unchanged': {0: 10, 1: 20, 2: 30},
+        'changed': {0: 15, 1: 20, 2: 5},
+        'added': {0: 10, 1: 20, 2: 30, 3: 40, 4: 50},
+        'removed': {1: 20},
+        'all': {0: 15, 1: 20, 3: 40},
+        'replaced': {3: 40, 4: 50},
+    }
+    TABLE = RecipeIngredient._meta.db_table
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.buyers = [create_user(1), create_user(2)]
+        cls.ingredients = list(Ingredient.objects.order_by('id')[:5])
+        # Рецепт с общим ингредиентом в корзине первого покупателя
+        other = create_recipe(cls.author, cls.ingredients[:1], amount=7)
+        ShoppingCart.objects.create(author=cls.buyers[0], recipe=other)
+
+    def create_recipe(self):
+        recipe = create_recipe(self.author, [])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe,
+                             ingredient=self.ingredients[index],
+                             amount=amount)
+            for index, amount in self.INITIAL.items()
+        )
+        for buyer in self.buyers:
+            ShoppingCart.objects.create(author=buyer, recipe=recipe)
+        return recipe
+
+    def count_statements(self, queries):
+        statements = {'INSERT': 0, 'UPDATE': 0, 'DELETE': 0}
+        for query in queries:
+            sql = query['sql']
+            verb = sql.split(None, 1)[0].upper()
+            if verb in statements and self.TABLE in sql:
+                statements[verb] += 1
+        return statements
+
+    def test_sync_ingredients(self):
+        serializer = RecipeCreateUpdateSerializer()
+        for name, amounts in self.CASES.items():
+            with self.subTest(case=name):
+                recipe = self.create_recipe()
+                data = [
+                    {'id': self.ingredients[index].id, 'amount': amount}
+                    for index, amount in amounts.items()
+                ]
+                with CaptureQueriesContext(connection) as queries:
+                    serializer._sync_ingredients(recipe, data)
+
+                for verb, count in self.count_statements(queries).items():
+                    self.assertLessEqual(count, 1, verb)
+                self.assertEqual(
+                    dict(recipe.recipeingredient_set.values_list(
+                        'ingredient_id', 'amount')),
+                    {item['id']: item['amount'] for item in data}
+                )
+                self.assert_shopping_lists(self.buyers)
+                recipe.delete()
+                self.assert_shopping_lists(self.buyers)
+
+
+class DownloadShoppingCartTests(QueryCountTestCase):
+    """Формат списка покупок и ошибок при разных Accept."""
+
+    PATH = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        recipe = create_recipe(cls.user, Ingredient.objects.order_by('id')[:2])
+        ShoppingCart.objects.create(author=cls.user, recipe=recipe)
+
+    def test_formats(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for accept, media_type in (
+                ('text/csv', 'text/csv'),
+                ('text/plain', 'text/plain'),
+                ('application/json', 'text/plain'),
+                ('*/*', 'text/plain')):
+            with self.subTest(accept=accept):
+                response = client.get(self.PATH, HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(
+                    response['Content-Type'].startswith(media_type)
+                )
+                self.assertEqual(
+                    len(b''.join(response.streaming_content).splitlines()),
+                    3 if media_type == 'text/csv' else 2
+                )
+
+    def test_errors_in_json(self):
+        for accept in ('text/plain', 'text/csv', 'application/json'):
+            with self.subTest(accept=accept):
+                response = APIClient().get(self.PATH, HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+
+class ShoppingListSignalTests(ShoppingListTestCase):
+    """Списки покупок при изменениях через ORM, как в админке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.buyers = [create_user(1), create_user(2)]
+        cls.ingredients = list(Ingredient.objects.order_by('id')[:4])
+        cls.recipe = create_recipe(cls.author, cls.ingredients[:2])
+        cls.other = create_recipe(cls.author, cls.ingredients[1:3], amount=5)
+        for buyer in cls.buyers:
+            ShoppingCart.objects.create(author=buyer, recipe=cls.recipe)
+        ShoppingCart.objects.create(author=cls.buyers[0], recipe=cls.other)
+
+    def test_recipe_ingredient_changes(self):
+        item = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredients[3], amount=4
+        )
+        self.assert_shopping_lists(self.buyers)
+        item.amount = 9
+        item.save()
+        self.assert_shopping_lists(self.buyers)
+        item.recipe = self.other
+        item.save()
+        self.assert_shopping_lists(self.buyers)
+        item.ingredient = self.ingredients[0]
+        item.save()
+        self.assert_shopping_lists(self.buyers)
+        item.delete()
+        self.assert_shopping_lists(self.buyers)
+        RecipeIngredient.objects.filter(recipe=self.other).delete()
+        self.assert_shopping_lists(self.buyers)
+
+    def test_cart_changes(self):
+        cart = ShoppingCart.objects.get(author=self.buyers[1])
+        cart.recipe = self.other
+        cart.save()
+        self.assert_shopping_lists(self.buyers)
+        cart.delete()
+        self.assert_shopping_lists(self.buyers)
+        ShoppingCart.objects.filter(author=self.buyers[0]).delete()
+        self.assert_shopping_lists(self.buyers)
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_cascades(self):
+        self.recipe.delete()
+        self.assert_shopping_lists(self.buyers)
+        self.ingredients[1].delete()
+        self.assert_shopping_lists(self.buyers)
+        self.author.delete()
+        self.assert_shopping_lists(self.buyers)
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+
+class LoadIngredientsTests(TestCase):
+    """load_ingredients различает ингредиенты по названию и единице."""
+
+    def test_same_name_other_unit(self):
+        ingredient = Ingredient.objects.order_by('id').first()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'ingredients.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('name,measurement_unit\n'
+                       f'{ingredient.name},{ingredient.measurement_unit}\n'
+                       f'{ingredient.name},шт\n'
+                       'новый ингредиент,г\n'
+                       'новый ингредиент,г\n')
+        count = Ingredient.objects.count()
+        for _ in range(2):
+            call_command('load_ingredients', path, verbosity=0)
+            self.assertEqual(Ingredient.objects.count(), count + 2)
+        self.assertEqual(
+            set(Ingredient.objects.filter(
+                name=ingredient.name
+            ).values_list('measurement_unit', flat=True)),
+            {ingredient.measurement_unit, 'шт'}
+        )
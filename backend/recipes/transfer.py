@@ -0,0 +1,338 @@
+"""Перенос рецептов и пользователей между окружениями в формате NDJSON.
+
+Каждая строка файла — объект с полем type: user, recipe, favorite,
+shopping_cart или subscription. Пользователи и рецепты выгружаются
+раньше ссылающихся на них записей, id в файле — id исходной БД.
+Ингредиенты рецептов ссылаются на ингредиенты по названию,
+изображения встраиваются в base64.
+"""
+import base64
+import gzip
+import io
+import json
+import os
+import sys
+import uuid
+from contextlib import nullcontext
+from itertools import groupby, islice
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+from backend.conditional import VIEWER_VERSION_CACHE_KEY, bump_versions
+from backend.pagination import invalidate_counts
+from recipes_models.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart
+)
+from users_models.models import CustomUser, Subscription
+from .cache import FEED_VERSION_CACHE_KEY, SHARED_VERSION_CACHE_KEY
+from .catalog import invalidate_catalog
+from .shopping_list import rebuild_shopping_lists
+
+
+EXPORT_CHUNK_SIZE = 500
+SHOPPING_LIST_REBUILD_CHUNK_SIZE = 500
+
+USER_FIELDS = ('email', 'username', 'first_name', 'last_name', 'password')
+
+
+def open_file(path, mode):
+    """Файл по пути, stdin/stdout для '-', gzip для расширения .gz."""
+    if path == '-':
+        return nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def encode_image(field_file):
+    if not field_file:
+        return None
+    with field_file.open('rb') as file:
+        data = base64.b64encode(file.read()).decode()
+    return {'name': os.path.basename(field_file.name), 'data': data}
+
+
+def decode_image(payload):
+    """Декодирует и проверяет изображение, выполняется в пуле процессов."""
+    if payload is None:
+        return None
+    content = base64.b64decode(payload['data'])
+    with Image.open(io.BytesIO(content)) as image:
+        image.verify()
+    return content
+
+
+def iter_export_records():
+    """Записи для выгрузки, по одной, без загрузки таблиц в память."""
+    for user in CustomUser.objects.order_by('id').iterator(
+            chunk_size=EXPORT_CHUNK_SIZE):
+        record = {'type': 'user', 'id': user.id}
+        record.update({field: getattr(user, field) for field in USER_FIELDS})
+        record['avatar'] = encode_image(user.avatar)
+        yield record
+
+    recipes = Recipe.objects.order_by('created_at', 'id').prefetch_related(
+        'recipeingredient_set__ingredient'
+    )
+    for recipe in recipes.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'recipe',
+            'id': recipe.id,
+            'author': recipe.author_id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'image': encode_image(recipe.image),
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.recipeingredient_set.all()
+            ],
+        }
+
+    for record_type, model in (('favorite', Favorite),
+                               ('shopping_cart', ShoppingCart)):
+        rows = model.objects.order_by('id').values_list(
+            'author_id', 'recipe_id'
+        )
+        for user_id, recipe_id in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {'type': record_type, 'user': user_id, 'recipe': recipe_id}
+
+    rows = Subscription.objects.order_by('id').values_list(
+        'user_id', 'author_id'
+    )
+    for user_id, author_id in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {'type': 'subscription', 'user': user_id, 'author': author_id}
+
+
+def write_records(records, file):
+    count = 0
+    for record in records:
+        file.write(json.dumps(record, ensure_ascii=False))
+        file.write('\n')
+        count += 1
+    return count
+
+
+def get_ingredient_key(item):
+    """Ингредиент определяется названием и единицей измерения."""
+    return item['name'], item['measurement_unit']
+
+
+def get_ingredient_keys(queryset):
+    return {
+        (name, measurement_unit): pk
+        for pk, name, measurement_unit in queryset.values_list(
+            'id', 'name', 'measurement_unit'
+        )
+    }
+
+
+def iter_batches(file, batch_size):
+    """Пачки подряд идущих записей одного типа, не больше batch_size."""
+    records = (json.loads(line) for line in file if line.strip())
+    for record_type, group in groupby(records, key=lambda r: r['type']):
+        while batch := list(islice(group, batch_size)):
+            yield record_type, batch
+
+
+class Importer:
+    """Загрузка пачек записей через bulk_create с заменой id.
+
+    В памяти держатся только текущая пачка и соответствие старых id
+    пользователей и рецептов новым. Пользователь с уже существующим
+    email не создаётся заново, записи ссылаются на существующего.
+    Декодирование изображений выполняется через map пула процессов.
+    """
+
+    def __init__(self, image_map=map):
+        self.image_map = image_map
+        self.user_ids = {}
+        self.recipe_ids = {}
+        self.ingredient_ids = get_ingredient_keys(Ingredient.objects.all())
+        self.existing_user_ids = set()
+        self.cart_user_ids = set()
+        self.ingredients_created = False
+        self.stats = dict.fromkeys(
+            ('user', 'recipe', 'favorite', 'shopping_cart', 'subscription',
+             'skipped'), 0
+        )
+
+    def import_batch(self, record_type, batch):
+        handler = getattr(self, f'import_{record_type}', None)
+        if handler is None:
+            raise ValueError(f'Unknown record type: {record_type}')
+        handler(batch)
+
+    def save_image(self, directory, payload, content):
+        extension = os.path.splitext(payload['name'])[1].lower()
+        return default_storage.save(
+            f'{directory}/{uuid.uuid4()}{extension}', ContentFile(content)
+        )
+
+    def import_user(self, batch):
+        emails = [record['email'] for record in batch]
+        existing = dict(CustomUser.objects.filter(
+            email__in=emails
+        ).values_list('email', 'id'))
+        taken_usernames = set(CustomUser.objects.filter(
+            username__in=[record['username'] for record in batch]
+        ).values_list('username', flat=True))
+
+        records, duplicates, first_records = [], [], {}
+        for record in batch:
+            email = record['email']
+            if email in existing:
+                self.user_ids[record['id']] = existing[email]
+                self.existing_user_ids.add(existing[email])
+                self.stats['skipped'] += 1
+            elif email in first_records:
+                # Повтор email внутри пачки нарушил бы уникальность
+                duplicates.append((record, first_records[email]))
+                self.stats['skipped'] += 1
+            else:
+                first_records[email] = record
+                records.append(record)
+
+        avatars = self.image_map(
+            decode_image, [record['avatar'] for record in records]
+        )
+        users = []
+        for record, avatar in zip(records, avatars):
+            username = record['username']
+            if username in taken_usernames:
+                username = f'{username}_{record["id"]}'
+            taken_usernames.add(username)
+            user = CustomUser(
+                **{field: record[field] for field in USER_FIELDS}
+            )
+            user.username = username
+            if avatar is not None:
+                user.avatar = self.save_image(
+                    'users', record['avatar'], avatar
+                )
+            users.append(user)
+
+        CustomUser.objects.bulk_create(users)
+        for record, user in zip(records, users):
+            self.user_ids[record['id']] = user.pk
+        for record, first_record in duplicates:
+            self.user_ids[record['id']] = self.user_ids[first_record['id']]
+        self.stats['user'] += len(users)
+
+    def get_ingredient_ids(self, batch):
+        missing = {
+            get_ingredient_key(item)
+            for record in batch for item in record['ingredients']
+        } - self.ingredient_ids.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in missing],
+                ignore_conflicts=True
+            )
+            self.ingredient_ids.update(get_ingredient_keys(
+                Ingredient.objects.filter(
+                    name__in={name for name, _ in missing}
+                )
+            ))
+            self.ingredients_created = True
+        return self.ingredient_ids
+
+    def import_recipe(self, batch):
+        records = [
+            record for record in batch if record['author'] in self.user_ids
+        ]
+        self.stats['skipped'] += len(batch) - len(records)
+        ingredient_ids = self.get_ingredient_ids(records)
+        images = self.image_map(
+            decode_image, [record['image'] for record in records]
+        )
+
+        recipes = [
+            Recipe(
+                author_id=self.user_ids[record['author']],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=(self.save_image('recipes', record['image'], image)
+                       if image is not None else ''),
+            )
+            for record, image in zip(records, images)
+        ]
+        Recipe.objects.bulk_create(recipes)
+
+        amounts = {}
+        for record, recipe in zip(records, recipes):
+            self.recipe_ids[record['id']] = recipe.pk
+            for item in record['ingredients']:
+                key = (recipe.pk, ingredient_ids[get_ingredient_key(item)])
+                amounts[key] = amounts.get(key, 0) + item['amount']
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=amount)
+            for (recipe_id, ingredient_id), amount in amounts.items()
+        )
+        self.stats['recipe'] += len(recipes)
+
+    def import_relation(self, batch, model, record_type):
+        rows = [
+            model(author_id=self.user_ids[record['user']],
+                  recipe_id=self.recipe_ids[record['recipe']])
+            for record in batch
+            if record['user'] in self.user_ids
+            and record['recipe'] in self.recipe_ids
+        ]
+        self.stats['skipped'] += len(batch) - len(rows)
+        model.objects.bulk_create(rows, ignore_conflicts=True)
+        self.stats[record_type] += len(rows)
+        return rows
+
+    def import_favorite(self, batch):
+        self.import_relation(batch, Favorite, 'favorite')
+
+    def import_shopping_cart(self, batch):
+        rows = self.import_relation(batch, ShoppingCart, 'shopping_cart')
+        self.cart_user_ids.update(row.author_id for row in rows)
+
+    def import_subscription(self, batch):
+        rows = [
+            Subscription(user_id=self.user_ids[record['user']],
+                         author_id=self.user_ids[record['author']])
+            for record in batch
+            if record['user'] in self.user_ids
+            and record['author'] in self.user_ids
+            and record['user'] != record['author']
+        ]
+        self.stats['skipped'] += len(batch) - len(rows)
+        Subscription.objects.bulk_create(rows, ignore_conflicts=True)
+        self.stats['subscription'] += len(rows)
+
+
+def refresh_after_bulk_load(cart_user_ids=(), existing_user_ids=(),
+                            ingredients_created=False, stdout=None):
+    """Обновляет то, что bulk_create обходит вместе с сигналами.
+
+    Пересобирает списки покупок пользователей, чьи корзины менялись,
+    сверяет счётчики и сбрасывает версии кешей выдач. Вызывается
+    внутри транзакции загрузки, версии меняются после коммита.
+    """
+    user_ids = iter(sorted(cart_user_ids))
+    while chunk := list(islice(user_ids, SHOPPING_LIST_REBUILD_CHUNK_SIZE)):
+        rebuild_shopping_lists(chunk)
+    call_command('reconcile_counters', stdout=stdout)
+    bump_versions(
+        FEED_VERSION_CACHE_KEY, SHARED_VERSION_CACHE_KEY,
+        *(VIEWER_VERSION_CACHE_KEY.format(user_id)
+          for user_id in existing_user_ids)
+    )
+    for model in (CustomUser, Recipe, Favorite, ShoppingCart, Subscription):
+        invalidate_counts(sender=model)
+    if ingredients_created:
+        invalidate_catalog()
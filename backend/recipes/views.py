@@ -1,54 +1,85 @@
 from rest_framework import viewsets, generics, permissions, views, status
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
 from django.shortcuts import redirect
-from django.http import HttpResponse
-from django.db.models import Sum, F, Value, CharField
-from django.db.models.functions import Concat
+from django.http import StreamingHttpResponse
+from django.db import transaction, IntegrityError
+from django.db.models import (
+    F, Value, BooleanField, Exists, OuterRef, Prefetch
+)
+from django_filters.rest_framework import DjangoFilterBackend
 
 from recipes_models.models import (
-    Recipe, Ingredient, ShoppingCart, RecipeIngredient, Favorite
+    Recipe, RecipeIngredient, ShoppingCart, Favorite
 )
+from backend.conditional import ConditionalGetMixin
+from backend.fast_serializers import FastReadMixin
+from backend.pagination import StandardPagination
+from backend.uploads import ImageUploadMixin
+from users_models.models import CustomUser
 from .serializers import (
     IngredientSerializer, RecipeListSerializer, RecipeCreateUpdateSerializer,
     RecipeShortSerializer
 )
+from .fast_serializers import FastRecipeSerializer
+from .filters import RecipeFilter
 from .permissions import IsAuthorOrReadOnly
+from .search import search_ingredients
+from .cache import RecipeResponseCacheMixin
+from .catalog import CATALOG_VERSION_CACHE_KEY, get_catalog
+from .renderers import (
+    ShoppingListTextRenderer, ShoppingListCSVRenderer, ShoppingListNegotiation
+)
+from .shopping_list import get_shopping_list, SHOPPING_LIST_WRITERS
 
 
 HEXADECIMAL_NUMBER_STRING_REPRESENTATION_STARTING_INDEX = 2
 HEXADECIMAL_NUMBER_BASE = 16
 
 
-class StandardPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'limit'
-
-
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(RecipeResponseCacheMixin, ImageUploadMixin,
+                    FastReadMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
+    fast_serializer_class = FastRecipeSerializer
     pagination_class = StandardPagination
     permission_classes = [IsAuthorOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = RecipeFilter
+    keyset_ordering = ('-created_at', '-id')
+    count_dependencies = (Favorite, ShoppingCart)
+    image_upload_fields = ('image',)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        request = self.request
-        user = request.user
-        params = request.query_params
-
-        if author_id := params.get('author'):
-            queryset = queryset.filter(author_id=author_id)
-
-        if params.get('is_favorited') == '1' and user.is_authenticated:
-            queryset = queryset.filter(
-                favorite_recipes__author=user).distinct()
-
-        if params.get('is_in_shopping_cart') == '1' and user.is_authenticated:
-            queryset = queryset.filter(shopping_cart__author=user).distinct()
+        queryset = self._annotate_user_flags(
+            super().get_queryset(), self.request.user
+        )
+        if self.fast_read:
+            return self.fast_serializer_class.select(queryset)
+        # Порядок ингредиентов тот же, что у FastRecipeSerializer
+        return queryset.select_related('author').prefetch_related(
+            Prefetch('recipeingredient_set',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient'
+                     ).order_by('id'))
+        )
 
-        return queryset
+    @staticmethod
+    def _annotate_user_flags(queryset, user):
+        # Флаги считаются подзапросами в том же SELECT,
+        # а не отдельным запросом на каждый рецепт
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                author=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                author=user, recipe=OuterRef('pk'))),
+        )
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -60,6 +91,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         context.update({'request': self.request})
         return context
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        CustomUser.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') - 1
+        )
+        instance.delete()
+
 
 class RecipeShortLinkView(generics.RetrieveAPIView):
     queryset = Recipe.objects.all()
@@ -87,24 +125,32 @@ class RecipeShortLinkRedirectView(views.APIView):
             raise NotFound('Not found')
 
 
-class IngredientListView(generics.ListAPIView):
+class IngredientListView(ConditionalGetMixin, generics.ListAPIView):
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
+    version_keys = (CATALOG_VERSION_CACHE_KEY,)
+    personalized = False
 
     def get_queryset(self):
-        queryset = Ingredient.objects.all()
         name = self.request.query_params.get('name')
 
         if name:
-            queryset = queryset.filter(name__startswith=name)
+            return search_ingredients(name)
 
-        return queryset
+        return get_catalog().all()
 
 
-class IngredientRetrieveView(generics.RetrieveAPIView):
+class IngredientRetrieveView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
-    queryset = Ingredient.objects.all()
+    version_keys = (CATALOG_VERSION_CACHE_KEY,)
+    personalized = False
+
+    def get_object(self):
+        ingredient = get_catalog().get(self.kwargs['pk'])
+        if ingredient is None:
+            raise NotFound('No Ingredient matches the given query.')
+        return ingredient
 
 
 class ShoppingCartView(views.APIView):
@@ -113,13 +159,18 @@ class ShoppingCartView(views.APIView):
     def post(self, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
 
-        if request.user.shopping_cart.filter(recipe=recipe).exists():
+        try:
+            with transaction.atomic():
+                ShoppingCart.objects.create(author=request.user, recipe=recipe)
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    cart_count=F('cart_count') + 1
+                )
+        except IntegrityError:
             return Response(
                 {"errors": 'Recipe is already in shopping cart'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ShoppingCart.objects.create(author=request.user, recipe=recipe)
         serializer = RecipeShortSerializer(
             recipe,
             context={'request': request}
@@ -128,42 +179,51 @@ class ShoppingCartView(views.APIView):
 
     def delete(self, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
-        cart_item = request.user.shopping_cart.filter(recipe=recipe).first()
 
-        if not cart_item:
+        with transaction.atomic():
+            deleted, _ = request.user.shopping_cart.filter(
+                recipe=recipe
+            ).delete()
+            if deleted:
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    cart_count=F('cart_count') - 1
+                )
+
+        if not deleted:
             return Response(
                 {"errors": 'Recipe does not exist in shopping cart'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cart_item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class DownloadShoppingCartView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [ShoppingListTextRenderer, ShoppingListCSVRenderer]
+    content_negotiation_class = ShoppingListNegotiation
+
+    def handle_exception(self, exc):
+        # Ошибки, например 401, отдаются в JSON, как во всём API
+        response = super().handle_exception(exc)
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        self.request.accepted_renderer = renderer
+        self.request.accepted_media_type = renderer.media_type
+        return response
 
     def get(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__author=request.user
-        ).values(
-            name=Concat(
-                F('ingredient__name'),
-                Value(' ('),
-                F('ingredient__measurement_unit'),
-                Value(')'),
-                output_field=CharField()
-            )
-        ).annotate(
-            total=Sum('amount')
-        ).order_by('name')
+        renderer = request.accepted_renderer
+        write = SHOPPING_LIST_WRITERS[renderer.format]
 
-        output = '\n'.join(
-            f"* {item['name']} - {item['total']}" for item in ingredients
+        response = StreamingHttpResponse(
+            write(get_shopping_list(request.user)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+            status=status.HTTP_200_OK
         )
-
-        return HttpResponse(output, content_type='text/plain',
-                            status=status.HTTP_200_OK)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping-list.{renderer.format}"'
+        )
+        return response
 
 
 class FavoriteView(views.APIView):
@@ -172,13 +232,18 @@ class FavoriteView(views.APIView):
     def post(self, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
 
-        if request.user.favorites.filter(recipe=recipe).exists():
+        try:
+            with transaction.atomic():
+                Favorite.objects.create(author=request.user, recipe=recipe)
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    favorites_count=F('favorites_count') + 1
+                )
+        except IntegrityError:
             return Response(
                 {"errors": "Рецепт уже в списке покупок"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        Favorite.objects.create(author=request.user, recipe=recipe)
         serializer = RecipeShortSerializer(
             recipe,
             context={'request': request}
@@ -187,13 +252,18 @@ class FavoriteView(views.APIView):
 
     def delete(self, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
-        cart_item = request.user.favorites.filter(recipe=recipe).first()
 
-        if not cart_item:
+        with transaction.atomic():
+            deleted, _ = request.user.favorites.filter(recipe=recipe).delete()
+            if deleted:
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    favorites_count=F('favorites_count') - 1
+                )
+
+        if not deleted:
             return Response(
                 {"errors": "Рецепта нет в списке покупок"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cart_item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
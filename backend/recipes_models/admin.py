@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import (Ingredient, Recipe,
-                     RecipeIngredient, ShoppingCart, Favorite)
+                     RecipeIngredient, ShoppingCart, Favorite,
+                     ShoppingListItem)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -15,7 +16,7 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = [RecipeIngredientInline]
 
     def favorites_count(self, obj):
-        return obj.favorite_set.count()
+        return obj.favorites_count
     favorites_count.short_description = 'В избранном'
 
 
@@ -38,3 +39,8 @@ class ShoppingCartAdmin(admin.ModelAdmin):
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('author', 'recipe')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
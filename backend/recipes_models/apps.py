@@ -1,5 +1,4 @@
 from django.apps import AppConfig
-import json
 
 
 class RecipesModelsConfig(AppConfig):
@@ -12,10 +11,12 @@ class RecipesModelsConfig(AppConfig):
 
 
 def load_initial_data(sender, **kwargs):
-    if kwargs['app_config'].name == 'recipes_models':
-        Ingredient = sender.get_model('Ingredient')
-        if not Ingredient.objects.exists():
-            with open('./ingredients.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data:
-                    Ingredient.objects.get_or_create(**item)
+    # Загрузка идемпотентна: пишутся только новые пары названия
+    # и единицы, поэтому она выполняется после каждого migrate
+    from django.core.management import call_command
+
+    call_command(
+        'load_ingredients',
+        database=kwargs.get('using', 'default'),
+        verbosity=kwargs.get('verbosity', 1),
+    )
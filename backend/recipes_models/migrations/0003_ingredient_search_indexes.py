@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:05
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+POSTGRESQL_INDEXES = (
+    ('ingredient_name_upper_pattern_idx',
+     'CREATE INDEX IF NOT EXISTS ingredient_name_upper_pattern_idx '
+     'ON recipes_models_ingredient (UPPER(name::text) text_pattern_ops)'),
+    ('ingredient_name_upper_trgm_idx',
+     'CREATE INDEX IF NOT EXISTS ingredient_name_upper_trgm_idx '
+     'ON recipes_models_ingredient '
+     'USING gin (UPPER(name::text) gin_trgm_ops)'),
+)
+
+
+def create_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, sql in POSTGRESQL_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in POSTGRESQL_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_models', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name'], name='ingredient_name_idx'),
+        ),
+        TrigramExtension(),
+        migrations.RunPython(
+            create_postgresql_indexes, drop_postgresql_indexes
+        ),
+    ]
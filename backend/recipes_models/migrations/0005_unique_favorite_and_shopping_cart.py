@@ -0,0 +1,72 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def delete_duplicates(model):
+    """Оставляет по одной строке на пару (author, recipe).
+
+    Возвращает id пользователей, у которых были удалены дубликаты.
+    """
+    duplicates = model.objects.values(
+        'author_id', 'recipe_id'
+    ).annotate(
+        keep_id=Min('id'), rows=Count('id')
+    ).filter(rows__gt=1)
+
+    author_ids = set()
+    for row in duplicates.iterator():
+        model.objects.filter(
+            author_id=row['author_id'], recipe_id=row['recipe_id']
+        ).exclude(id=row['keep_id']).delete()
+        author_ids.add(row['author_id'])
+    return author_ids
+
+
+def deduplicate(apps, schema_editor):
+    Favorite = apps.get_model('recipes_models', 'Favorite')
+    ShoppingCart = apps.get_model('recipes_models', 'ShoppingCart')
+    RecipeIngredient = apps.get_model('recipes_models', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes_models', 'ShoppingListItem')
+
+    delete_duplicates(Favorite)
+    user_ids = delete_duplicates(ShoppingCart)
+    if not user_ids:
+        return
+
+    # Дубликаты в корзине учитывались в списке покупок,
+    # поэтому списки затронутых пользователей пересчитываются
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    totals = RecipeIngredient.objects.filter(
+        recipe__shopping_cart__author_id__in=user_ids
+    ).values_list(
+        'recipe__shopping_cart__author_id', 'ingredient_id'
+    ).annotate(total=Sum('amount'))
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          amount=total)
+         for user_id, ingredient_id, total in totals.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_models', '0004_shoppinglistitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='favorite',
+            unique_together={('author', 'recipe')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='shoppingcart',
+            unique_together={('author', 'recipe')},
+        ),
+    ]
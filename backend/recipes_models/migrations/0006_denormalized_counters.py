@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+COUNTERS = (
+    ('recipes_models', 'Recipe', 'favorites_count',
+     'recipes_models', 'Favorite', 'recipe'),
+    ('recipes_models', 'Recipe', 'cart_count',
+     'recipes_models', 'ShoppingCart', 'recipe'),
+    ('users_models', 'CustomUser', 'recipes_count',
+     'recipes_models', 'Recipe', 'author'),
+    ('users_models', 'CustomUser', 'followers_count',
+     'users_models', 'Subscription', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, related_app, related_model, fk in COUNTERS:
+        related = apps.get_model(related_app, related_model)
+        apps.get_model(app, model).objects.update(**{field: Coalesce(
+            Subquery(
+                related.objects.filter(
+                    **{fk: OuterRef('pk')}
+                ).order_by().values(fk).annotate(
+                    total=Count('pk')
+                ).values('total')
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_models', '0005_unique_favorite_and_shopping_cart'),
+        ('users_models', '0002_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:25
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_rows(model, owner, keep_id, ingredient_ids):
+    """Сливает строки с ингредиентами-дубликатами в одну на владельца."""
+    rows = model.objects.filter(ingredient_id__in=ingredient_ids)
+    totals = list(rows.values_list(owner).annotate(total=Sum('amount')))
+    rows.delete()
+    model.objects.bulk_create(
+        (model(**{owner: owner_id}, ingredient_id=keep_id, amount=total)
+         for owner_id, total in totals),
+        batch_size=1000
+    )
+
+
+def merge_duplicates(apps, schema_editor):
+    """Оставляет один ингредиент на название и единицу измерения.
+
+    Сливаются только точные дубликаты: количества в разных единицах
+    складывать нельзя. Количества в рецептах и списках покупок
+    складываются в строку оставшегося ингредиента.
+    """
+    Ingredient = apps.get_model('recipes_models', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes_models', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes_models', 'ShoppingListItem')
+
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), rows=Count('id')
+    ).filter(rows__gt=1)
+
+    for row in duplicates.iterator():
+        ingredient_ids = list(Ingredient.objects.filter(
+            name=row['name'], measurement_unit=row['measurement_unit']
+        ).values_list('id', flat=True))
+        merge_rows(RecipeIngredient, 'recipe_id', row['keep_id'],
+                   ingredient_ids)
+        merge_rows(ShoppingListItem, 'user_id', row['keep_id'],
+                   ingredient_ids)
+        Ingredient.objects.filter(
+            id__in=ingredient_ids
+        ).exclude(id=row['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_models', '0009_recipe_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Отдельно от 0010: на PostgreSQL ALTER TABLE нельзя выполнить
+    # в одной транзакции с удалением строк, на которые есть внешние ключи
+    dependencies = [
+        ('recipes_models', '0010_merge_duplicate_ingredients'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='ingredient_name_unit_unique'),
+        ),
+    ]
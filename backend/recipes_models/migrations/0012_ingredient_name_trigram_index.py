@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+# Поиск по началу и подстроке идёт по каталогу в памяти, индексы
+# по UPPER(name) из 0003 запросы не используют. Нечёткий поиск
+# фильтрует по name %> запрос, этот оператор обслуживает GIN-индекс
+# gin_trgm_ops по самой колонке name
+UNUSED_INDEXES = (
+    'ingredient_name_upper_pattern_idx',
+    'ingredient_name_upper_trgm_idx',
+)
+TRIGRAM_INDEX = (
+    'CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx '
+    'ON recipes_models_ingredient USING gin (name gin_trgm_ops)'
+)
+RESTORE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS ingredient_name_upper_pattern_idx '
+    'ON recipes_models_ingredient (UPPER(name::text) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS ingredient_name_upper_trgm_idx '
+    'ON recipes_models_ingredient '
+    'USING gin (UPPER(name::text) gin_trgm_ops)',
+)
+
+
+def replace_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in UNUSED_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    schema_editor.execute(TRIGRAM_INDEX)
+
+
+def restore_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm_idx')
+    for sql in RESTORE_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes_models', '0011_unique_ingredient_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_indexes, restore_indexes),
+    ]
@@ -10,6 +10,19 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=64, null=False, blank=False, name='measurement_unit'
     )
+    # Вместе с числом строк и последним id даёт версию каталога,
+    # когда кеш не общий для процессов, см. recipes.catalog
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Ключ для загрузки командой load_ingredients, заменяет индекс
+        # ingredient_name_idx: поиск по name идёт по первой колонке
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='ingredient_name_unit_unique'
+            ),
+        ]
 
 
 class Recipe(models.Model):
@@ -29,12 +42,33 @@ class Recipe(models.Model):
         blank=False, null=False, name='cooking_time',
         validators=[MinValueValidator(1)]
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Миниатюры изображения, заполняются пайплайном backend.images
+    image_thumbnails = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
 
     ingredients = models.ManyToManyField(
         Ingredient,
         through='RecipeIngredient',
     )
 
+    # Денормализованные счётчики, меняются через F() в представлениях
+    # и сверяются командой reconcile_counters
+    favorites_count = models.IntegerField(default=0, editable=False)
+    cart_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ('-created_at', '-id')
+        indexes = [
+            models.Index(fields=['created_at', 'id'],
+                         name='recipe_created_at_id_idx'),
+            models.Index(fields=['author', 'created_at'],
+                         name='recipe_author_created_at_idx'),
+            models.Index(fields=['cooking_time'],
+                         name='recipe_cooking_time_idx'),
+        ]
+
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
@@ -65,6 +99,9 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart'
     )
 
+    class Meta:
+        unique_together = ('author', 'recipe')
+
 
 class Favorite(models.Model):
     recipe = models.ForeignKey(
@@ -77,3 +114,27 @@ class Favorite(models.Model):
         blank=False, null=False,
         related_name='favorites'
     )
+
+    class Meta:
+        unique_together = ('author', 'recipe')
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя.
+
+    Поддерживается инкрементально при изменении корзины и ингредиентов
+    рецептов, чтобы список покупок читался без агрегации.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        blank=False, null=False,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, blank=False,
+        null=False
+    )
+    amount = models.IntegerField(blank=False, null=False, name='amount')
+
+    class Meta:
+        unique_together = ('user', 'ingredient')
@@ -3,3 +3,16 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from backend.conditional import invalidate_viewer
+        from backend.images import schedule_thumbnails
+        from backend.pagination import invalidate_counts
+        from users_models.models import CustomUser, Subscription
+        for model in (CustomUser, Subscription):
+            post_save.connect(invalidate_counts, sender=model)
+            post_delete.connect(invalidate_counts, sender=model)
+        post_save.connect(invalidate_viewer, sender=Subscription)
+        post_save.connect(schedule_thumbnails, sender=CustomUser)
+        post_delete.connect(invalidate_viewer, sender=Subscription)
@@ -0,0 +1,88 @@
+from operator import itemgetter
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from backend.fast_serializers import FastSerializer, UrlBuilder
+from recipes_models.models import Recipe
+from users_models.models import CustomUser
+from .serializers import get_recipes_limit, get_subscribed_author_ids
+
+
+USER_COLUMNS = (
+    'id', 'email', 'username', 'first_name', 'last_name',
+    'avatar', 'avatar_thumbnails',
+)
+
+
+def get_user_plan(request, prefix=''):
+    """План полей UserListSerializer по колонкам с префиксом prefix."""
+    urls = UrlBuilder(request, CustomUser._meta.get_field('avatar').storage)
+    get_id = itemgetter(f'{prefix}id')
+    get_avatar = itemgetter(f'{prefix}avatar')
+    get_thumbnails = itemgetter(f'{prefix}avatar_thumbnails')
+    return (
+        ('id', get_id),
+        ('email', itemgetter(f'{prefix}email')),
+        ('username', itemgetter(f'{prefix}username')),
+        ('first_name', itemgetter(f'{prefix}first_name')),
+        ('last_name', itemgetter(f'{prefix}last_name')),
+        ('is_subscribed',
+         lambda row: get_id(row) in get_subscribed_author_ids(request)),
+        ('avatar', lambda row: urls.file_url(get_avatar(row))),
+        ('avatar_srcset',
+         lambda row: urls.srcset(get_avatar(row), get_thumbnails(row))),
+    )
+
+
+class FastUserSerializer(FastSerializer):
+    """Быстрый аналог UserListSerializer."""
+
+    columns = USER_COLUMNS
+
+    def get_plan(self, rows):
+        return get_user_plan(self.context['request'])
+
+
+class FastSubscriptionSerializer(FastSerializer):
+    """Быстрый аналог SubscriptionUserSerializer.
+
+    Первые recipes_limit рецептов всех авторов страницы загружаются
+    одним запросом с ROW_NUMBER() по разделу автора.
+    """
+
+    columns = USER_COLUMNS + ('recipes_count',)
+
+    def get_plan(self, rows):
+        request = self.context['request']
+        recipes = self.get_recipes(request, [row['id'] for row in rows])
+        return get_user_plan(request) + (
+            ('recipes', lambda row: recipes.get(row['id'], [])),
+            ('recipes_count', itemgetter('recipes_count')),
+        )
+
+    @staticmethod
+    def get_recipes(request, author_ids):
+        limit = get_recipes_limit(request)
+        if not author_ids or limit == 0:
+            return {}
+        queryset = Recipe.objects.filter(author_id__in=author_ids)
+        if limit is not None:
+            queryset = queryset.annotate(position=Window(
+                RowNumber(), partition_by=F('author_id'),
+                order_by=F('id').asc()
+            )).filter(position__lte=limit)
+        urls = UrlBuilder(request, Recipe._meta.get_field('image').storage)
+        recipes = {}
+        for author_id, pk, name, image, thumbnails, cooking_time in (
+                queryset.order_by('id').values_list(
+                    'author_id', 'id', 'name', 'image', 'image_thumbnails',
+                    'cooking_time')):
+            recipes.setdefault(author_id, []).append({
+                'id': pk,
+                'name': name,
+                'image': urls.file_url(image),
+                'image_srcset': urls.srcset(image, thumbnails),
+                'cooking_time': cooking_time,
+            })
+        return recipes
@@ -1,8 +1,47 @@
 from rest_framework import serializers
+from django.db import transaction
+from django.db.models import F
+from backend.images import build_srcset
+from backend.instrumentation import MeasuredSerializerMixin
 from users_models.models import CustomUser, Subscription
 from recipes_models.models import Recipe
 
 
+def get_subscribed_author_ids(request):
+    """Множество id авторов, на которых подписан текущий пользователь.
+
+    Загружается одним запросом и кешируется на объекте запроса,
+    чтобы все вложенные UserListSerializer использовали его повторно.
+    """
+    subscribed_ids = getattr(request, '_subscribed_author_ids', None)
+    if subscribed_ids is None:
+        user = request.user
+        if user.is_authenticated:
+            subscribed_ids = frozenset(
+                user.follower.values_list('author_id', flat=True)
+            )
+        else:
+            subscribed_ids = frozenset()
+        request._subscribed_author_ids = subscribed_ids
+    return subscribed_ids
+
+
+def reset_subscribed_author_ids(request):
+    if hasattr(request, '_subscribed_author_ids'):
+        del request._subscribed_author_ids
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return None
+    try:
+        limit = int(recipes_limit)
+    except ValueError:
+        return None
+    return limit if limit >= 0 else None
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -29,24 +68,21 @@ class AvatarUploadSerializer(serializers.ModelSerializer):
         fields = ('avatar',)
 
 
-class UserListSerializer(serializers.ModelSerializer):
+class UserListSerializer(MeasuredSerializerMixin,
+                         serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
+    avatar_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
         fields = (
             'id', 'email', 'username', 'first_name',
-            'last_name', 'is_subscribed', 'avatar'
+            'last_name', 'is_subscribed', 'avatar', 'avatar_srcset'
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context['request']
-        user = request.user
-
-        if user.is_authenticated:
-            return user.follower.filter(author=obj).exists()
-        return False
+        return obj.id in get_subscribed_author_ids(self.context['request'])
 
     def get_avatar(self, obj):
         request = self.context['request']
@@ -54,38 +90,45 @@ class UserListSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.avatar.url)
         return None
 
+    def get_avatar_srcset(self, obj):
+        return build_srcset(
+            self.context['request'], obj.avatar, obj.avatar_thumbnails
+        )
+
+
+class RecipeShortSerializer(MeasuredSerializerMixin,
+                            serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
 
-class RecipeShortSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
+
+    def get_image_srcset(self, obj):
+        return build_srcset(
+            self.context['request'], obj.image, obj.image_thumbnails
+        )
 
 
 class SubscriptionUserSerializer(UserListSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta(UserListSerializer.Meta):
         fields = UserListSerializer.Meta.fields + ('recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        request = self.context['request']
-        recipes_limit = request.query_params.get('recipes_limit')
-
-        recipes_qs = obj.author.all()
-        if recipes_limit is not None:
-            try:
-                limit = int(recipes_limit)
+        if hasattr(obj, 'limited_recipes'):
+            recipes_qs = obj.limited_recipes
+        else:
+            recipes_qs = obj.author.order_by('id')
+            limit = get_recipes_limit(self.context['request'])
+            if limit is not None:
                 recipes_qs = recipes_qs[:limit]
-            except ValueError:
-                pass
 
         return RecipeShortSerializer(recipes_qs,
                                      many=True, context=self.context).data
 
-    def get_recipes_count(self, obj):
-        return obj.author.count()
-
 
 class SubscriptionCreateSerializer(serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(
@@ -112,6 +155,14 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        user = self.context['request'].user
+        request = self.context['request']
         author = validated_data['author']
-        return Subscription.objects.create(user=user, author=author)
+        with transaction.atomic():
+            subscription = Subscription.objects.create(
+                user=request.user, author=author
+            )
+            CustomUser.objects.filter(pk=author.pk).update(
+                followers_count=F('followers_count') + 1
+            )
+        reset_subscribed_author_ids(request)
+        return subscription
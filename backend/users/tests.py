@@ -0,0 +1,107 @@
+import base64
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+
+from recipes.tests import (
+    QueryCountTestCase, create_recipe, create_user, image_data
+)
+from recipes_models.models import Ingredient
+from users_models.models import CustomUser, Subscription
+
+
+class SubscriptionsQueryCountTests(QueryCountTestCase):
+    """Число запросов подписок не зависит от размера страницы."""
+
+    # Подписки, подписки для is_subscribed, рецепты авторов;
+    # без курсора ещё COUNT(*)
+    QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user(0)
+        ingredients = list(Ingredient.objects.order_by('id')[:3])
+        for index in range(1, 13):
+            author = create_user(index)
+            Subscription.objects.create(user=cls.reader, author=author)
+            for _ in range(index % 4 + 1):
+                create_recipe(author, ingredients)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        for fast in (False, True):
+            for limit in (1, 5, 12):
+                for recipes_limit in ('', '&recipes_limit=2'):
+                    with self.subTest(fast=fast, limit=limit,
+                                      recipes_limit=recipes_limit):
+                        with self.settings(FAST_READ_SERIALIZERS=fast):
+                            response, queries = self.count_queries(
+                                client, 'get',
+                                '/api/users/subscriptions/'
+                                f'?limit={limit}{recipes_limit}'
+                            )
+                        self.assertEqual(response.status_code, 200)
+                        results = response.data['results']
+                        self.assertEqual(len(results), limit)
+                        if recipes_limit:
+                            self.assertTrue(all(
+                                len(author['recipes']) <= 2
+                                for author in results
+                            ))
+                        self.assertEqual(queries, self.QUERIES)
+
+
+class AvatarUploadTests(QueryCountTestCase):
+    """Аватар из base64 и multipart проходит одну проверку."""
+
+    PATH = '/api/users/me/avatar/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_invalid_avatar(self):
+        text = base64.b64encode(b'not an image').decode()
+        for avatar in (12345, ['a'], f'data:image/png;base64,{text}',
+                       'data:image/png;base64,???'):
+            with self.subTest(avatar=avatar):
+                response = self.client.put(
+                    self.PATH, {'avatar': avatar}, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('avatar', response.data)
+        response = self.client.put(self.PATH, {'avatar': SimpleUploadedFile(
+            'avatar.png', b'not an image', content_type='image/png'
+        )}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+
+    def test_valid_avatar(self):
+        png = base64.b64decode(image_data().split(',')[1])
+        for data, format in (
+                ({'avatar': image_data()}, 'json'),
+                ({'avatar': SimpleUploadedFile('avatar.png', png)},
+                 'multipart')):
+            with self.subTest(format=format):
+                response = self.client.put(self.PATH, data, format=format)
+                self.assertEqual(response.status_code, 200)
+                self.user.refresh_from_db()
+                self.assertTrue(self.user.avatar.name.endswith('.png'))
+
+    def test_delete_clears_thumbnails(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            avatar='users/avatar.png',
+            avatar_thumbnails={'96': 'users/avatar-96.webp'}
+        )
+        response = self.client.delete(self.PATH)
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+        self.assertEqual(self.user.avatar_thumbnails, {})
@@ -1,31 +1,42 @@
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.core.files.base import ContentFile
-from rest_framework.pagination import PageNumberPagination
-
-import base64
-import uuid
-
-from users_models.models import CustomUser
+from django.db import transaction
+from django.db.models import F, Prefetch
+
+from backend.conditional import ConditionalGetMixin
+from backend.fast_serializers import FastReadMixin
+from backend.pagination import StandardPagination
+from backend.uploads import ImageUploadField, ImageUploadMixin
+from recipes.cache import FEED_VERSION_CACHE_KEY, SHARED_VERSION_CACHE_KEY
+from users_models.models import CustomUser, Subscription
+from recipes_models.models import Recipe
+from .fast_serializers import FastSubscriptionSerializer, FastUserSerializer
 from .serializers import (
     UserListSerializer,
     UserCreateSerializer,
     SubscriptionUserSerializer,
-    SubscriptionCreateSerializer
+    SubscriptionCreateSerializer,
+    get_recipes_limit
 )
 
 
-class StandardPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'limit'
-
-
-class UserListCreateView(generics.ListCreateAPIView):
-    queryset = CustomUser.objects.all()
+class UserListCreateView(ConditionalGetMixin, FastReadMixin,
+                         generics.ListCreateAPIView):
+    queryset = CustomUser.objects.order_by('id')
     permission_classes = [permissions.AllowAny]
     pagination_class = StandardPagination
+    keyset_ordering = ('id',)
+    version_keys = (SHARED_VERSION_CACHE_KEY,)
+    fast_serializer_class = FastUserSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.fast_read:
+            return self.fast_serializer_class.select(queryset)
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -33,45 +44,48 @@ class UserListCreateView(generics.ListCreateAPIView):
         return UserListSerializer
 
 
-class UserDetailView(generics.RetrieveAPIView):
+class UserDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserListSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'id'
+    version_keys = (SHARED_VERSION_CACHE_KEY,)
 
 
-class CurrentUserView(APIView):
+class CurrentUserView(ConditionalGetMixin, generics.RetrieveAPIView):
+    serializer_class = UserListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_keys = (SHARED_VERSION_CACHE_KEY,)
 
-    def get(self, request):
-        serializer = UserListSerializer(
-            request.user, context={'request': request})
-        return Response(serializer.data)
+    def get_object(self):
+        return self.request.user
 
 
-class AvatarUploadView(APIView):
+class AvatarUploadView(ImageUploadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    image_upload_fields = ('avatar',)
 
     def put(self, request):
-        avatar_base64 = request.data.get('avatar')
+        avatar = request.data.get('avatar')
 
-        if not avatar_base64:
+        if not avatar:
             return Response(
                 {'avatar': ['This field is required']},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Файл из multipart/form-data и строка base64 проходят одну
+        # проверку: тип, размер и открытие изображения через Pillow
         try:
-            format, imgstr = avatar_base64.split(';base64,')
-            ext = format.split('/')[-1]
-            file_name = f'{uuid.uuid4()}.{ext}'
-            data = ContentFile(base64.b64decode(imgstr), name=file_name)
-        except Exception:
+            data = ImageUploadField().to_internal_value(avatar)
+        except ValidationError as error:
             return Response(
-                {'avatar': ['Invalid image format']},
+                {'avatar': error.detail},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return self.save_avatar(request, data)
 
+    def save_avatar(self, request, data):
         user = request.user
         user.avatar = data
         user.save()
@@ -80,18 +94,45 @@ class AvatarUploadView(APIView):
             {'avatar': request.build_absolute_uri(user.avatar.url)})
 
     def delete(self, request):
+        # Файл может быть общим с другими аватарами и рецептами,
+        # его удалит gc_media, когда ссылок не останется. Миниатюры
+        # сбрасываются вместе с ним: gc_media удалит и их, а повторная
+        # загрузка того же файла получит то же имя и старый srcset
         user = request.user
-        user.avatar.delete(save=True)
+        user.avatar = None
+        user.avatar_thumbnails = {}
+        user.save(update_fields=['avatar', 'avatar_thumbnails'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SubscriptionsView(generics.ListAPIView):
+class SubscriptionsView(ConditionalGetMixin, FastReadMixin,
+                        generics.ListAPIView):
     serializer_class = SubscriptionUserSerializer
+    fast_serializer_class = FastSubscriptionSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardPagination
+    keyset_ordering = ('id',)
+    count_dependencies = (Subscription,)
+    # Выдача включает рецепты авторов и их количество
+    version_keys = (SHARED_VERSION_CACHE_KEY, FEED_VERSION_CACHE_KEY)
 
     def get_queryset(self):
-        return CustomUser.objects.filter(following__user=self.request.user)
+        queryset = CustomUser.objects.filter(
+            following__user=self.request.user
+        ).order_by('id')
+        if self.fast_read:
+            return self.fast_serializer_class.select(queryset)
+
+        # Первые recipes_limit рецептов каждого автора выбираются
+        # одним запросом с ROW_NUMBER() по разделу автора
+        recipes = Recipe.objects.order_by('id')
+        limit = get_recipes_limit(self.request)
+        if limit is not None:
+            recipes = recipes[:limit]
+
+        return queryset.prefetch_related(
+            Prefetch('author', queryset=recipes, to_attr='limited_recipes')
+        )
 
 
 class SubscribeView(APIView):
@@ -114,10 +155,15 @@ class SubscribeView(APIView):
     def delete(self, request, id):
         author = get_object_or_404(CustomUser, id=id)
         user = request.user
-        subscription = user.follower.filter(author=author)
 
-        if subscription.exists():
-            subscription.delete()
+        with transaction.atomic():
+            deleted, _ = user.follower.filter(author=author).delete()
+            if deleted:
+                CustomUser.objects.filter(pk=author.pk).update(
+                    followers_count=F('followers_count') - 1
+                )
+
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(
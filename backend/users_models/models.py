@@ -7,6 +7,15 @@ class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     avatar = models.ImageField(upload_to='users/',
                                blank=True, null=True)
+    # Миниатюры аватара, заполняются пайплайном backend.images
+    avatar_thumbnails = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
+
+    # Денормализованные счётчики, меняются через F() в представлениях
+    # и сверяются командой reconcile_counters
+    recipes_count = models.IntegerField(default=0, editable=False)
+    followers_count = models.IntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']